@@ -2,116 +2,221 @@
 """Main entry point to execute the simulations.
 
 """
+import argparse
 import configparser
 import os
 import sys
 
-from graph import Graph
-from log import write as logwrite
-from prob import Probability
-from simul import simulate
-from walk import Walk
+import checkpoint
+import ensemble
+import jobs
+import log
+import metrics
+import sweep
+from simulation import configure, stopping
+from sink import FNAMES, FORMATS, StreamSink, ThreadedSink, file_sink
 
-# Load the setting from configuration file.
 FILENAME = 'rrwg.conf'
-config = configparser.ConfigParser()
-if os.path.exists(FILENAME):
-    config.read(FILENAME)
-else:
-    print('ERROR: Create a configuration file named "{}" '.format(FILENAME)+
-          'in the current directory. \n'
-          'See rrwg.conf.example in the project directory or '+
-          'https://github.com/aholanda/rrwg/blob/main/rrwg.conf.example '+
-          'for an example of configuration file.')
-    sys.exit(-1)
-
-if __name__ == "__main__":
-    #Initialize a graph and walks after using the parameters from the
-    #configuration file.
-    walks = []
-
-    if 'type' in config['default']:
-        gtype = config['default']['type']
-    else:
-        MSG = """graph "type" is not defined in {}.
-    Graph "type" should be:
-    complete: complete graph with no partitions
-    partitions: non-complete graph with partitions
-    \t\tof complete subgraphs.""".format(FILENAME)
-        sys.exit('panic: {}'.format(MSG))
-    logwrite('type={}'.format(gtype))
-
-    # Number of vertices
-    if 'vertices' in config['default']:
-        nverts = int(config['default']['vertices'])
+
+def read_config(fname=FILENAME) -> configparser.ConfigParser:
+    """Return the settings of the configuration file, exit if it does not
+    exist.
+
+    """
+    if not os.path.exists(fname):
+        print('ERROR: Create a configuration file named "{}" '.format(fname)+
+              'in the current directory. \n'
+              'See rrwg.conf.example in the project directory or '+
+              'https://github.com/aholanda/rrwg/blob/main/rrwg.conf.example '+
+              'for an example of configuration file.')
+        sys.exit(-1)
+    config = configparser.ConfigParser()
+    config.read(fname)
+    return config
+
+def wrote(fnames: list):
+    """Show the names of the files written.
+
+    """
+    for fname in fnames:
+        print('* Wrote {}'.format(fname))
+
+def main():
+    """Run the simulation set by the configuration file.
+
+    """
+    parser = argparse.ArgumentParser(prog='rrwg')
+    parser.add_argument('--log', choices=list(log.LEVELS),
+                        help='log level, overrides "log" in {}'
+                        .format(FILENAME))
+    parser.add_argument('--replicas', type=int,
+                        help='number of independent replicas, overrides '
+                        '"replicas" in {}'.format(FILENAME))
+    parser.add_argument('--workers', type=int,
+                        help='number of worker processes running the '
+                        'replicas, overrides "workers" in {}'
+                        .format(FILENAME))
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the run saved in {}'
+                        .format(checkpoint.FNAME))
+    parser.add_argument('--sweep', action='store_true',
+                        help='run the points of the grid in the [sweep] '
+                        'section of {}'.format(FILENAME))
+    parser.add_argument('--jobs', metavar='QUEUE',
+                        help='run the jobs read from the queue directory '
+                        'QUEUE, or from the standard input if QUEUE is -')
+    parser.add_argument('--watch', action='store_true',
+                        help='wait for new jobs when the queue is empty')
+    args = parser.parse_args()
+    if args.jobs and not os.path.exists(FILENAME):
+        # The jobs have their own parameters.
+        config = configparser.ConfigParser()
+        config['default'] = {}
     else:
-        sys.exit('panic: number of "vertices" was not set in {}'
-                 .format(FILENAME))
-    logwrite('vertices={}'.format(nverts))
-
-    if gtype == 'complete':
-        func = config['default']['function']
-        prob = Probability(func)
-
-        graph = Graph(nverts)
-        for i in graph.vertices():
-            # The walk can traverse all vertices.
-            walk = Walk(graph.vertices(), i)
-            walks.append(walk)
-
-    elif gtype == 'partitions':
-        # For paritions function is always POWER
-        prob = Probability('POW')
-
-        if 'partition_size' in config['default']:
-            partsize = int(config['default']['partition_size'])
-        else:
-            sys.exit('panic: "partition_size" was not set in {}.'
+        config = read_config()
+    params = config['default']
+
+    # Only the parameters of the run are logged by default.
+    loglevel = args.log or params.get('log', 'info')
+    try:
+        # The log of a resumed run goes on after the log of the run.
+        log.configure(loglevel, append=args.resume)
+    except ValueError as err:
+        sys.exit('panic: {}'.format(err))
+
+    if args.sweep:
+        if 'sweep' not in config:
+            sys.exit('panic: there is no [sweep] section in {}'
                      .format(FILENAME))
-
-        if partsize > nverts:
-            sys.exit('panic: number of partitions > number of vertices')
-
-        graph = Graph(nverts, complete=False,
-                      partition_size=partsize)
-        for i in graph.vertices():
-            # Each walk starts at the vertex with
-            # the same id and the number of partitions
-            # is the range where it can walk. For example,
-            # a walk with id 2 starts at v2, and if the
-            # number of partitions is 2, it can walk at
-            # v2 and v3.
-            # All subgraphs are complete.
-
-            # Partitions in terms of vertices.
-            part = graph.partition(i)
-            # Make the edges
-            for j in part:
-                graph.add_edge(i, j)
-            walk = Walk(part, i)
-            walks.append(walk)
+        try:
+            nfailed = sweep.run(config, args.workers or
+                                params.getint('workers', fallback=0),
+                                loglevel=loglevel)
+        except (OSError, ValueError) as err:
+            sys.exit('panic: {}'.format(err))
+        sys.exit(1 if nfailed else 0)
+
+    if args.jobs:
+        nworkers = args.workers if args.workers is not None else \
+            params.getint('workers', fallback=0)
+        try:
+            if args.jobs == '-':
+                queue = jobs.read_stream(sys.stdin)
+            else:
+                queue = jobs.read_queue(args.jobs, args.watch)
+            nfailed = jobs.run(queue, nworkers, loglevel=loglevel)
+        except (OSError, RuntimeError) as err:
+            sys.exit('panic: {}'.format(err))
+        except KeyboardInterrupt:
+            sys.exit(130)
+        sys.exit(1 if nfailed else 0)
+
+    try:
+        sim = configure(params, FILENAME)
+    except (OSError, ValueError) as err:
+        sys.exit('panic: {}'.format(err))
+
+    # Output format and the interval between the steps written.
+    output = params.get('output', 'text')
+    if output not in FNAMES:
+        sys.exit('panic: unknown output format "{}"'.format(output))
+    stride = params.getint('stride', fallback=1)
+
+    # Number of independent replicas and of worker processes to run
+    # them, 0 workers uses all CPUs.
+    nreplicas = args.replicas or params.getint('replicas', fallback=1)
+    nworkers = args.workers if args.workers is not None else \
+        params.getint('workers', fallback=0)
+    # The replicas run in worker processes (process) or all at once
+    # as an axis of the arrays in this process (batch), and the walks
+    # of a single run may be split among worker processes (shared).
+    engine = params.get('engine', 'process')
+    if engine not in ('process', 'batch', 'shared'):
+        sys.exit('panic: unknown engine "{}" in {}'.format(engine, FILENAME))
+    if engine == 'shared' and nreplicas > 1:
+        sys.exit('panic: the shared engine runs a single replica')
+    if engine == 'shared' and sim.dynamics == 'async':
+        sys.exit('panic: the async dynamics runs in a single process')
+    if sim.dynamics == 'async' and nreplicas > 1:
+        sys.exit('panic: the async dynamics runs a single replica')
+    if args.resume and nreplicas > 1:
+        sys.exit('panic: only a single replica can be resumed')
+    # Stop when the occupation of the walks is stable (optional).
+    if params.get('stop', 'off') != 'off' and nreplicas > 1 and \
+       engine == 'batch':
+        sys.exit('panic: the batch engine has no stopping rule')
+    try:
+        stop = stopping(params)
+    except ValueError as err:
+        sys.exit('panic: {}'.format(err))
+    if nreplicas > 1 and engine == 'batch':
+        log.info('replicas={}\nengine={}', nreplicas, engine)
+        sinks = [file_sink(ensemble.replica_fname(FNAMES[output], i),
+                           output) for i in range(nreplicas)]
+        sim.run_batch(nreplicas, sinks, stride)
+        wrote([sink.fname for sink in sinks])
+        sys.exit(0)
+    elif nreplicas > 1:
+        log.info('replicas={}\nworkers={}', nreplicas, nworkers)
+        wrote(sim.run_ensemble(nreplicas, nworkers, output, stride,
+                               loglevel, stop))
+        sys.exit(0)
+
+    # Where the rows are written and the number of steps waiting to
+    # be written by the writer thread (0 writes in the simulation
+    # loop).
+    sinkname = params.get('sink', 'file')
+    queue = params.getint('queue', fallback=16)
+    # Steps and seconds between the checkpoints, 0 disables them.
+    ckpt_steps = params.getint('checkpoint', fallback=0)
+    ckpt_time = params.getfloat('checkpoint_time', fallback=0.0)
+    # Time of the phases of the steps written as JSON next to the
+    # output, and seconds between the progress lines.
+    profiled = params.getboolean('profile', fallback=False)
+    progress = params.getfloat('progress', fallback=0.0)
+    profile = None
+    if profiled or progress:
+        profile = metrics.Profile(sim.nsteps, progress,
+                                  metrics.report_fname(FNAMES[output])
+                                  if profiled else None)
+    if sinkname == 'file':
+        sink = file_sink(fmt=output)
+    elif sinkname == 'stdout':
+        if output not in FORMATS:
+            sys.exit('panic: the {} output cannot be written to the '
+                     'standard output'.format(output))
+        sink = StreamSink(fmt=output)
     else:
-        sys.exit('panic: unknown graph type "{}" in {}'
-                 .format(gtype, FILENAME))
-
-    if 'alpha' in config['default']:
-        prob.alpha = float(config['default']['alpha'])
-    if 'epsilon' in config['default']:
-        prob.epsilon = float(config['default']['epsilon'])
-    logwrite('function={}\nalpha={}\nepsilon={}'
-             .format(prob.function_name(),
-                     prob.alpha,
-                     prob.epsilon))
-
-    if 'time' in config['default']:
-        nsteps = int(config['default']['time'])
+        sys.exit('panic: unknown sink "{}" in {}'.format(sinkname, FILENAME))
+    fnames = [sink.fname] if sinkname == 'file' else []
+    if profile is not None and profile.fname is not None:
+        fnames.append(profile.fname)
+    if queue > 0:
+        sink = ThreadedSink(sink, queue)
+    ckpt = None
+    if ckpt_steps or ckpt_time:
+        try:
+            ckpt = checkpoint.Checkpoint(every=ckpt_steps,
+                                         seconds=ckpt_time)
+        except ValueError as err:
+            sys.exit('panic: {}'.format(err))
+
+    log.info('dynamics={}', sim.dynamics)
+    if engine == 'shared':
+        log.info('engine={}', engine)
     else:
-        sys.exit('panic: "time" steps was not set in {}.'
-                 .format(FILENAME))
-
-    SEED = None
-    if 'seed' in config['default']:
-        SEED = int(config['default']['seed'])
-        logwrite('seed={}'.format(SEED))
-
-    simulate(nsteps, graph, walks, prob, SEED)
+        nworkers = 1
+    try:
+        if args.resume:
+            # The seed is replaced by the entropy of the saved run.
+            sim.resume(checkpoint.FNAME, sink, stride, stop, profile, ckpt,
+                       nworkers)
+        else:
+            sim.run(sink, stride, stop=stop, profile=profile, ckpt=ckpt,
+                    nworkers=nworkers)
+    except (OSError, RuntimeError, ValueError) as err:
+        sys.exit('panic: {}'.format(err))
+    wrote(fnames)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Analysis of the output of a simulation in chunks of rows.
+
+The output, text or binary, is read a chunk of rows at a time, the
+binary file is memory-mapped, so it does not need to fit in memory. The
+walk and the vertex of each column come from the header of the output,
+the labels of the first line of the text or the JSON header of the
+binary. The curves are the occupation of each walk in each vertex of its
+territory (walk), the share of the visits of each vertex (vertex) and
+the running mean of the occupation over the rows, the cumulative visits
+divided by the number of steps as in rrwg.R (cumulative). They are
+reduced to about a number of points by keeping every k-th row (decimate)
+or the minimum and the maximum of each k rows (envelope), and written
+to a NumPy record or plotted.
+
+    python3 analysis.py rrwg.npy --curve cumulative --plot rrwg.pdf
+
+"""
+import argparse
+import math
+import os
+import re
+import sys
+
+import numpy as np
+
+from data import Output
+from sink import FNAMES, normalize
+
+CURVES = ('walk', 'vertex', 'cumulative')
+METHODS = ('decimate', 'envelope')
+# Curves written by default.
+FNAME = 'rrwg-curves.npz'
+# Rows read at once and points kept by default.
+CHUNK = 4096
+POINTS = 2000
+# Label of a column of the text output.
+LABEL = re.compile(r'w(\d+)v(\d+)')
+
+class TextOutput():
+    """Reader of the text output in chunks of rows. The metadata in the
+    comment lines is added to the header when they are read.
+
+    """
+    def __init__(self, fname=FNAMES['text'], stride=1):
+        """Read the layout from the labels of the columns.
+
+        fname (str): name of the text output file
+        stride (int): stride between the steps written, it is not
+                      in the text output
+
+        """
+        self.fname = fname
+        with open(fname) as datf:
+            labels = [LABEL.fullmatch(label)
+                      for label in datf.readline().split()]
+        if not labels or not all(labels):
+            raise ValueError('{} has no line with the labels of the '
+                             'columns'.format(fname))
+        self.walk_ids = np.array([int(label[1]) for label in labels])
+        self.vertex_ids = np.array([int(label[2]) for label in labels])
+        self.header = {'walks': int(self.walk_ids.max()) + 1,
+                       'vertices': int(self.vertex_ids.max()) + 1,
+                       'stride': stride}
+        self._nrows = None
+
+    def __len__(self):
+        if self._nrows is None:
+            with open(self.fname, 'rb') as datf:
+                datf.readline()
+                self._nrows = sum(1 for line in datf
+                                  if not line.startswith(b'#'))
+        return self._nrows
+
+    def steps(self) -> np.ndarray:
+        """Return the step of each row.
+
+        """
+        return np.arange(len(self)) * self.header['stride']
+
+    def chunks(self, size=CHUNK):
+        """Yield the occupation of the rows in blocks of size rows.
+
+        """
+        ncols = len(self.walk_ids)
+        with open(self.fname) as datf:
+            datf.readline()
+            lines = []
+            for line in datf:
+                if line.startswith('#'):
+                    key, _, value = line[1:].strip().partition('=')
+                    self.header[key] = value
+                    continue
+                lines.append(line)
+                if len(lines) == size:
+                    yield np.fromstring(''.join(lines), sep=' ') \
+                        .reshape(-1, ncols)
+                    lines = []
+            if lines:
+                yield np.fromstring(''.join(lines), sep=' ') \
+                    .reshape(-1, ncols)
+
+def open_output(fname: str, stride=1):
+    """Return the reader of the output file, binary if it is a .npy file
+    and text otherwise.
+
+    stride (int): stride between the steps of the text output
+
+    """
+    if fname.endswith('.npy'):
+        return Output(fname)
+    return TextOutput(fname, stride)
+
+def labels(output, curve='walk') -> list[str]:
+    """Return the label of each column of the curve.
+
+    """
+    if curve == 'vertex':
+        return ['v{}'.format(v) for v in np.unique(output.vertex_ids)]
+    return ['w{}v{}'.format(w, v)
+            for w, v in zip(output.walk_ids, output.vertex_ids)]
+
+def curves(output, curve='walk', size=CHUNK):
+    """Yield the rows of the curve of the output in blocks of size rows.
+
+    output (Output|TextOutput): reader of the output
+    curve (str): "walk", "vertex" or "cumulative"
+    size (int): number of rows read at once
+
+    """
+    if curve not in CURVES:
+        raise ValueError('unknown curve "{}", it should be one of {}'
+                         .format(curve, ', '.join(CURVES)))
+    counted = isinstance(output, Output)
+    if curve == 'vertex' and not counted and \
+       len(np.unique(np.bincount(output.walk_ids))) > 1:
+        raise ValueError('the vertex curve of the text output needs '
+                         'territories of the same size, use the binary '
+                         'output')
+    # Columns sorted by vertex and the first column of each vertex.
+    order = np.argsort(output.vertex_ids, kind='stable')
+    starts = np.flatnonzero(np.diff(output.vertex_ids[order],
+                                    prepend=-1))
+    nwalks = len(np.unique(output.walk_ids))
+    total, nrows = 0.0, 0
+    for block in output.chunks(size):
+        block = np.asarray(block, dtype=np.float64)
+        if curve == 'vertex':
+            visits = np.add.reduceat(block[:, order], starts, axis=1) \
+                if block.shape[1] else block
+            if counted:
+                yield visits / block.sum(axis=1, keepdims=True)
+            else:
+                # The text has only the occupation, the walks are taken
+                # to have the same number of visits, which holds in the
+                # sync dynamics with territories of the same size.
+                yield visits / nwalks
+            continue
+        occ = normalize(block, output.walk_ids) if counted else block
+        if curve == 'walk':
+            yield occ
+            continue
+        sums = total + np.cumsum(occ, axis=0)
+        total = sums[-1]
+        yield sums / np.arange(nrows+1, nrows+len(occ)+1)[:, None]
+        nrows += len(occ)
+
+def downsample(blocks, every: int, method='decimate'):
+    """Yield the blocks of rows reduced to every every-th row (decimate),
+    or to the minimum and maximum of every every rows (envelope) as a
+    pair of arrays. The blocks must have a multiple of every rows, but
+    the last one.
+
+    """
+    if method not in METHODS:
+        raise ValueError('unknown method "{}", it should be one of {}'
+                         .format(method, ', '.join(METHODS)))
+    for block in blocks:
+        if method == 'decimate':
+            yield block[::every]
+        else:
+            bins = np.arange(0, len(block), every)
+            yield (np.minimum.reduceat(block, bins, axis=0),
+                   np.maximum.reduceat(block, bins, axis=0))
+
+def analyze(fname: str, curve='walk', points=POINTS, method='decimate',
+            size=CHUNK, stride=1) -> dict:
+    """Return the curve of the output file with about points rows, its
+    steps and the labels of its columns. The rows are in values for
+    decimate and in min and max for envelope.
+
+    fname (str): name of the text or binary output file
+    curve (str): "walk", "vertex" or "cumulative"
+    points (int): number of rows kept, all rows if 0
+    method (str): "decimate" or "envelope"
+    size (int): number of rows read at once
+    stride (int): stride between the steps of the text output
+
+    """
+    output = open_output(fname, stride)
+    nrows = len(output)
+    every = max(1, math.ceil(nrows / points)) if points else 1
+    # The bins of the envelope are not split between the chunks.
+    size = max(1, size // every) * every
+    blocks = list(downsample(curves(output, curve, size), every, method))
+    ncols = len(labels(output, curve))
+    result = {'steps': output.steps()[::every],
+              'labels': np.array(labels(output, curve)),
+              'every': every}
+    if method == 'decimate':
+        result['values'] = np.concatenate(blocks) if blocks \
+            else np.zeros((0, ncols))
+    else:
+        for i, key in enumerate(('min', 'max')):
+            result[key] = np.concatenate([pair[i] for pair in blocks]) \
+                if blocks else np.zeros((0, ncols))
+    return result
+
+def plot(result: dict, fname='rrwg.pdf'):
+    """Plot the curve with a box per walk, or a single box for the curve
+    of the vertices, in two columns. It needs matplotlib.
+
+    """
+    # pylint: disable=import-outside-toplevel
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+
+    names = [str(label) for label in result['labels']]
+    groups = {}
+    for col, label in enumerate(names):
+        box = label.split('v')[0] if label.startswith('w') else 'v'
+        groups.setdefault(box, []).append(col)
+    nboxes = len(groups)
+    ncols = 2 if nboxes > 1 else 1
+    fig, axes = plt.subplots(math.ceil(nboxes / ncols), ncols,
+                             squeeze=False, sharex=True,
+                             figsize=(8, 1.5 * math.ceil(nboxes / ncols)))
+    steps = result['steps']
+    for ax, cols in zip(axes.flat, groups.values()):
+        for col in cols:
+            if 'values' in result:
+                ax.plot(steps, result['values'][:, col], lw=1,
+                        label=names[col])
+            else:
+                ax.fill_between(steps, result['min'][:, col],
+                                result['max'][:, col], lw=0,
+                                label=names[col])
+        ax.set_ylim(0, 1)
+    for ax in axes.flat[nboxes:]:
+        ax.axis('off')
+    fig.savefig(fname)
+    plt.close(fig)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='analysis')
+    parser.add_argument('output', nargs='?',
+                        help='text or binary output file, {} or {} if '
+                        'not given'.format(FNAMES['binary'],
+                                           FNAMES['text']))
+    parser.add_argument('--curve', choices=CURVES, default='walk',
+                        help='curve computed')
+    parser.add_argument('--points', type=int, default=POINTS,
+                        help='number of rows kept, all rows if 0')
+    parser.add_argument('--method', choices=METHODS, default='decimate',
+                        help='how the rows are reduced to the points')
+    parser.add_argument('--chunk', type=int, default=CHUNK,
+                        help='number of rows read at once')
+    parser.add_argument('--stride', type=int, default=1,
+                        help='stride between the steps of the text output')
+    parser.add_argument('-o', '--curves', default=FNAME,
+                        help='NumPy record of the curve')
+    parser.add_argument('--plot', help='plot the curve to this file, like '
+                        'rrwg.pdf')
+    args = parser.parse_args()
+
+    FILE = args.output or (FNAMES['binary'] if os.path.exists(
+        FNAMES['binary']) else FNAMES['text'])
+    try:
+        RESULT = analyze(FILE, args.curve, args.points, args.method,
+                         args.chunk, args.stride)
+    except (OSError, ValueError) as err:
+        sys.exit('panic: {}'.format(err))
+    np.savez(args.curves, **RESULT)
+    print('* Wrote {}'.format(args.curves))
+    if args.plot:
+        try:
+            plot(RESULT, args.plot)
+        except ImportError:
+            sys.exit('panic: matplotlib is needed to plot the curve')
+        print('* Wrote {}'.format(args.plot))
@@ -0,0 +1,78 @@
+"""Simulate many replicas of a small graph at once in a single process.
+
+The replicas are the first axis of the arrays of state, so the number
+of visits is a replicas x cells array, in the CSR layout of the walks,
+and each step of all replicas is done by the same few array operations,
+the choice of the next vertex included. The replica r follows the same
+streams of pseudo-random numbers of simul.simulate with the same seed
+and replica r, so both give the same result.
+
+"""
+import numpy as np
+
+import log
+from data import header
+from graph import Graph
+from prob import Probability
+from rng import Streams, sample_cells
+from territory import Territory
+from walk import Walks
+
+def simulate_batch(nreplicas: int, nsteps: int, graph: Graph,
+                   walks: Walks, prob: Probability, seed=None,
+                   territory=None, sinks=None, stride=1) -> np.ndarray:
+    """Simulate the replicas and return their number of visits at the end
+    as a replicas x cells array in the layout of walks.cells.
+
+    nreplicas (int): number of replicas
+    nsteps (int): the number of steps to walk
+    graph (Graph): graph where the walks are walking
+    walks (Walks): initial state of the walks of all replicas, it is
+                   not modified
+    prob (Probability): transition probability
+    seed (int): seed of the pseudo-random number generator
+    territory (Territory): index of the walks allowed in each vertex,
+                           it is built from the walks if not given
+    sinks (list[Sink]): output of each replica (optional)
+    stride (int): write only every stride-th step to the sinks
+
+    """
+    if territory is None:
+        territory = Territory(walks)
+    nwalks = len(walks.locations)
+    streams = Streams(seed)
+    log.info('entropy={}', streams.entropy)
+    replicas = np.arange(nreplicas)
+
+    counts = np.repeat(walks.counts[None], nreplicas, axis=0)
+    vertex_totals = np.repeat(walks.vertex_totals[None], nreplicas, axis=0)
+    locs = np.repeat(walks.locations[None], nreplicas, axis=0)
+    # Indices to update the visits of all replicas and walks at once.
+    reps = np.repeat(replicas, nwalks).reshape(nreplicas, nwalks)
+    cells = territory.cells()
+    groups = territory.groups()
+
+    sinks = sinks or []
+    for sink in sinks:
+        sink.open(header(walks, stride))
+
+    def write(step):
+        for i, sink in enumerate(sinks):
+            sink.write(step, counts[i].copy())
+
+    write(0)
+    for i in range(1, nsteps+1):
+        log.debug('t={}', i)
+        probs = prob.state_transitions(counts, vertex_totals, locs, graph,
+                                       territory)
+        pos = sample_cells(probs, groups,
+                           streams.uniforms(i, nwalks, replicas))
+        locs = cells[pos]
+        counts[reps, pos] += 1
+        np.add.at(vertex_totals, (reps, locs), 1)
+        if i % stride == 0:
+            write(i)
+
+    for sink in sinks:
+        sink.close()
+    return counts
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Benchmarks of the simulation over grids of graph sizes, number of
+walks, partition sizes, transition functions and steps.
+
+Each case runs in its own process, so the peak resident memory is the
+one of the case. The time of each phase, the graph construction, the
+setup of the walks, the probability calculation, the simulation and the
+output, the steps per second and the peak resident memory are written
+as JSON. The command compare reports the cases of a result that are
+slower or use more memory than in a baseline result.
+
+The simulation is timed with the batched engine or, with --engine
+reference, with the scalar loop of the first versions, which calculates
+the probability of each walk to each vertex with Probability.calculate
+and moves the walks one by one. The reference result is the baseline
+of the batched engine on the same machine:
+
+    python3 bench.py run --engine reference -o reference.json
+    python3 bench.py run -o bench.json
+    python3 bench.py compare reference.json bench.json
+
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from data import Data
+from graph import Graph
+from prob import Probability
+from rng import Streams, sample
+from simul import simulate
+from sink import FileSink, Sink
+from territory import Territory
+from walk import Walks
+
+FNAME = 'bench.json'
+# Fraction that a metric may be worse than the baseline.
+THRESHOLD = 0.1
+# Number of single probability calculations timed.
+NCALCS = 1000
+# Engines that the simulation may be timed with.
+ENGINES = ('batched', 'reference')
+# Seed of the simulations.
+SEED = 1
+
+def grid(quick=False) -> list[dict]:
+    """Return the parameters of the benchmark cases.
+
+    quick (bool): only small cases
+
+    """
+    sizes = [10, 100] if quick else [10, 100, 1000]
+    # The first number of steps is used by all cases, the others only
+    # by the time axis.
+    steps = [50, 100] if quick else [200, 800]
+    cases = []
+    for nverts in sizes:
+        # Walks fewer than, as many as and more than the vertices, the
+        # walk i starts at the vertex i mod vertices.
+        for nwalks in (max(nverts // 2, 1), nverts, 2 * nverts):
+            for func in ('EXP', 'POW'):
+                cases.append({'type': 'complete', 'vertices': nverts,
+                              'walks': nwalks, 'partition_size': 0,
+                              'function': func, 'time': steps[0]})
+        for nsteps in steps[1:]:
+            cases.append({'type': 'complete', 'vertices': nverts,
+                          'walks': nverts, 'partition_size': 0,
+                          'function': 'POW', 'time': nsteps})
+    for nverts in [s * 10 for s in sizes]:
+        for partsize in (3, 10):
+            for nsteps in steps:
+                cases.append({'type': 'partitions', 'vertices': nverts,
+                              'walks': nverts, 'partition_size': partsize,
+                              'function': 'POW', 'time': nsteps})
+    return cases
+
+def case_name(params: dict) -> str:
+    """Return the name that identifies the case in the results.
+
+    """
+    return '{type}-v{vertices}-w{walks}-p{partition_size}-{function}' \
+        '-t{time}'.format(**params)
+
+class NullSink(Sink):
+    """Discard the rows, the simulation is timed without output.
+
+    """
+    def write(self, step: int, row: np.ndarray):
+        pass
+
+def make_graph(params: dict) -> Graph:
+    """Return the graph of the case.
+
+    """
+    if params['type'] == 'complete':
+        return Graph(params['vertices'])
+    graph = Graph(params['vertices'], complete=False,
+                  partition_size=params['partition_size'])
+    graph.connect_partitions()
+    return graph
+
+def make_walks(params: dict, graph: Graph) -> Walks:
+    """Return the walks of the case, with the whole graph as territory in
+    the complete graph or a partition in the graph of partitions.
+
+    """
+    nverts, nwalks = params['vertices'], params['walks']
+    walks = Walks(nwalks, nverts)
+    verts = graph.neighbors(0)
+    for i in range(nwalks):
+        if params['type'] == 'complete':
+            walks.add(verts, i % nverts)
+        else:
+            walks.add(graph.partition(i % nverts), i % nverts)
+    return walks
+
+def simulate_reference(nsteps: int, graph: Graph, walks: Walks,
+                       prob: Probability, territory: Territory,
+                       data: Data):
+    """Walk with the scalar loop of the first versions: the weight of
+    each walk to each vertex of its territory is calculated by
+    Probability.calculate, one pair at a time, and the walks visit their
+    next vertex one by one. The walks take the same pseudo-random
+    numbers as in simulate().
+
+    """
+    streams = Streams(SEED)
+    for i in range(1, nsteps+1):
+        rands = streams.uniforms(i, len(walks))
+        dests = []
+        for walk in walks:
+            v_src = walk.cur_location()
+            verts = walk.vertices()
+            weights = np.array([prob.calculate(walks, walk, v_dest,
+                                               territory)
+                                if graph.adjacent(v_src, v_dest) else 0.0
+                                for v_dest in verts])
+            dests.append(verts[sample(weights, rands[walk.index])])
+        for walk, v_dest in zip(walks, dests):
+            walk.visit(v_dest)
+        data.write()
+    data.close()
+
+def timed(func, *args, **kwargs) -> float:
+    """Return the seconds taken by the call.
+
+    """
+    begin = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - begin
+
+def write_rows(data: Data, nrows: int):
+    """Write the current state of the walks nrows times.
+
+    """
+    for _ in range(nrows):
+        data.write()
+
+def run_case(params: dict, engine='batched') -> dict:
+    """Run the phases of the case and return their measures.
+
+    engine (str): engine of the simulation, one of ENGINES
+
+    """
+    phases = {}
+    begin = time.perf_counter()
+    graph = make_graph(params)
+    phases['graph'] = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    walks = make_walks(params, graph)
+    territory = Territory(walks)
+    phases['walks'] = time.perf_counter() - begin
+    prob = Probability(params['function'])
+
+    rng = np.random.default_rng(0)
+    calls = [(int(w), int(rng.choice(walks[int(w)].vertices())))
+             for w in rng.integers(len(walks), size=NCALCS)]
+    begin = time.perf_counter()
+    for wid, vert in calls:
+        prob.calculate(walks, walks[wid], vert, territory)
+    phases['calculate'] = (time.perf_counter() - begin) / NCALCS
+
+    phases['transitions'] = timed(prob.transitions, walks, graph, territory)
+
+    nsteps = params['time']
+    data = Data(walks, sink=NullSink())
+    if engine == 'reference':
+        phases['simulate'] = timed(simulate_reference, nsteps, graph,
+                                   walks, prob, territory, data)
+    else:
+        phases['simulate'] = timed(simulate, nsteps, graph, walks, prob,
+                                   SEED, territory=territory, data=data)
+
+    with tempfile.TemporaryDirectory() as tmpdir, \
+         contextlib.redirect_stdout(io.StringIO()):
+        for fmt in ('text', 'binary'):
+            data = Data(walks, sink=FileSink(os.path.join(tmpdir, fmt),
+                                             fmt))
+            phases['write_' + fmt] = timed(write_rows, data, nsteps)
+            data.close()
+
+    # The peak resident memory is in KiB on Linux.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'name': case_name(params), 'params': params, 'engine': engine,
+            'steps_per_sec': nsteps / phases['simulate'],
+            'peak_rss_kb': rss, 'phases': phases}
+
+def run(cases: list[dict], fname: str, engine='batched'):
+    """Run each case in a new process and write the results as JSON.
+
+    engine (str): engine of the simulation, one of ENGINES
+
+    """
+    results = []
+    for params in cases:
+        proc = subprocess.run([sys.executable, __file__, 'case',
+                               '--engine', engine, json.dumps(params)],
+                              capture_output=True, text=True, check=True)
+        result = json.loads(proc.stdout)
+        print('{:40s} {:12.1f} steps/s {:10d} KiB'
+              .format(result['name'], result['steps_per_sec'],
+                      result['peak_rss_kb']))
+        results.append(result)
+    report = {'python': platform.python_version(),
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'engine': engine,
+              'cases': results}
+    with open(fname, 'w') as outf:
+        json.dump(report, outf, indent=1)
+    print('* Wrote {}'.format(fname))
+
+def compare(baseline: dict, current: dict, threshold=THRESHOLD) -> list:
+    """Return the regressions of the current results, the metrics worse
+    than in the baseline by more than the threshold.
+
+    """
+    base = {res['name']: res for res in baseline['cases']}
+    regressions = []
+    for res in current['cases']:
+        old = base.get(res['name'])
+        if old is None:
+            continue
+        # The throughput must not drop, the time and memory not grow.
+        metrics = [('steps_per_sec', old['steps_per_sec'],
+                    res['steps_per_sec'], -1),
+                   ('peak_rss_kb', old['peak_rss_kb'],
+                    res['peak_rss_kb'], 1)]
+        metrics += [('phases.' + name, old['phases'][name], secs, 1)
+                    for name, secs in res['phases'].items()
+                    if name in old['phases']]
+        for metric, before, after, sign in metrics:
+            if before > 0 and sign * (after - before) / before > threshold:
+                regressions.append((res['name'], metric, before, after))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='bench')
+    commands = parser.add_subparsers(dest='command', required=True)
+    runp = commands.add_parser('run', help='run the benchmarks')
+    runp.add_argument('-o', '--output', default=FNAME,
+                      help='JSON file of the results')
+    runp.add_argument('--quick', action='store_true',
+                      help='run only small cases')
+    runp.add_argument('--filter', default='',
+                      help='run only the cases whose name has this text')
+    runp.add_argument('--engine', choices=ENGINES, default='batched',
+                      help='engine of the simulation')
+    casep = commands.add_parser('case', help='run a single case given '
+                                'as JSON and print its results')
+    casep.add_argument('--engine', choices=ENGINES, default='batched',
+                       help='engine of the simulation')
+    casep.add_argument('params')
+    cmpp = commands.add_parser('compare', help='report the regressions '
+                               'of a result against a baseline')
+    cmpp.add_argument('baseline')
+    cmpp.add_argument('current')
+    cmpp.add_argument('--threshold', type=float, default=THRESHOLD,
+                      help='fraction that a metric may be worse')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run([params for params in grid(args.quick)
+             if args.filter in case_name(params)], args.output,
+            args.engine)
+    elif args.command == 'case':
+        with contextlib.redirect_stdout(io.StringIO()):
+            RESULT = run_case(json.loads(args.params), args.engine)
+        print(json.dumps(RESULT))
+    else:
+        with open(args.baseline) as basef, open(args.current) as curf:
+            REGRESSIONS = compare(json.load(basef), json.load(curf),
+                                  args.threshold)
+        for name, metric, before, after in REGRESSIONS:
+            print('{}: {} {:.4g} -> {:.4g}'.format(name, metric, before,
+                                                   after))
+        print('{} regressions'.format(len(REGRESSIONS)))
+        sys.exit(1 if REGRESSIONS else 0)
@@ -0,0 +1,140 @@
+"""Checkpoints of a running simulation.
+
+A checkpoint is a single .npz file with the state of the walks, the last
+step simulated, the entropy of the pseudo-random numbers, the stride
+of the output and the window of samples of the stopping rule. The
+numbers of a step depend only on the entropy and on the step, so the
+simulation resumed from a checkpoint continues exactly as the run that
+was stopped. The file is written to a temporary file
+and renamed, a run stopped while it is saved keeps the previous
+checkpoint.
+
+"""
+import os
+import time
+
+import numpy as np
+
+from data import Data
+from walk import STATE, Walks
+
+FNAME = 'rrwg-ckpt.npz'
+
+def save(fname: str, walks: Walks, step: int, entropy: int, stride=1,
+         stop=None):
+    """Write the checkpoint of the walks at the step.
+
+    fname (str): name of the checkpoint file
+    walks (Walks): walks whose state is saved
+    step (int): last step simulated
+    entropy (int): entropy of the streams of pseudo-random numbers
+    stride (int): stride between the steps written to the output
+    stop (Convergence): stopping rule whose samples are saved (optional)
+
+    """
+    arrays = {name: getattr(walks, name) for name in STATE}
+    if stop is not None:
+        samples, nsamples = stop.state()
+        arrays.update(stop_settings=stop.settings(), stop_samples=samples,
+                      stop_nsamples=nsamples)
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as ckptf:
+        # The entropy may not fit in 64 bits.
+        np.savez(ckptf, step=step, entropy=str(entropy), stride=stride,
+                 **arrays)
+        ckptf.flush()
+        os.fsync(ckptf.fileno())
+    os.replace(tmp, fname)
+
+def load(fname: str, walks: Walks, stride=1,
+         stop=None) -> tuple[int, int]:
+    """Restore the state of the walks from the checkpoint and return the
+    last step simulated and the entropy of the streams. The walks, the
+    stride and the stopping rule must be the same of the run saved.
+
+    fname (str): name of the checkpoint file
+    walks (Walks): walks whose state is restored
+    stride (int): stride between the steps written to the output
+    stop (Convergence): stopping rule whose samples are restored
+                        (optional)
+
+    """
+    with np.load(fname) as ckpt:
+        if 'indptr' not in ckpt:
+            raise ValueError('the checkpoint {} was saved by an older '
+                             'version'.format(fname))
+        if not np.array_equal(ckpt['indptr'], walks.indptr) or \
+           not np.array_equal(ckpt['cells'], walks.cells):
+            raise ValueError('the walks of the checkpoint {} differ from '
+                             'the configured walks'.format(fname))
+        if int(ckpt['stride']) != stride:
+            raise ValueError('the checkpoint {} was saved with stride {}'
+                             .format(fname, int(ckpt['stride'])))
+        if stop is not None:
+            if 'stop_settings' not in ckpt or \
+               not np.array_equal(ckpt['stop_settings'], stop.settings()):
+                raise ValueError('the checkpoint {} was saved without the '
+                                 'same stopping rule'.format(fname))
+            stop.restore(ckpt['stop_samples'], int(ckpt['stop_nsamples']))
+        for name in STATE:
+            getattr(walks, name)[...] = ckpt[name]
+        return int(ckpt['step']), int(str(ckpt['entropy']))
+
+class Checkpoint():
+    """Save the walks every number of steps or of seconds.
+
+    """
+    def __init__(self, fname=FNAME, every=0, seconds=0.0):
+        """fname (str): name of the checkpoint file
+        every (int): steps between the checkpoints, 0 to disable
+        seconds (float): seconds between the checkpoints, 0 to disable
+
+        """
+        if every < 0 or seconds < 0:
+            raise ValueError('checkpoint interval must not be negative')
+        self._walks = None
+        self._data = None
+        self._stop = None
+        self.fname = fname
+        self._every = every
+        self._seconds = seconds
+        self._last = time.monotonic()
+
+    def start(self, walks: Walks, data: Data, stop=None):
+        """Start saving the walks of a run.
+
+        walks (Walks): walks whose state is saved
+        data (Data): output flushed before each checkpoint, so the
+                     output has all rows up to the step saved
+        stop (Convergence): stopping rule whose samples are saved
+                            (optional)
+
+        """
+        self._walks = walks
+        self._data = data
+        self._stop = stop
+        self._last = time.monotonic()
+
+    def update(self, step: int, entropy: int) -> bool:
+        """Save the walks if the step or the time since the last checkpoint
+        is due and return True if they were saved.
+
+        step (int): last step simulated
+        entropy (int): entropy of the streams of pseudo-random numbers
+
+        """
+        due = self._every and step % self._every == 0
+        if not due and self._seconds:
+            due = time.monotonic() - self._last >= self._seconds
+        if due:
+            self.save(step, entropy)
+        return bool(due)
+
+    def save(self, step: int, entropy: int):
+        """Flush the output and save the walks at the step.
+
+        """
+        self._data.flush()
+        save(self.fname, self._walks, step, entropy, self._data.stride,
+             self._stop)
+        self._last = time.monotonic()
@@ -0,0 +1,128 @@
+"""Stopping rules that end the simulation when the occupation of the
+walks has stabilized.
+
+The occupation of a walk is the number of visits in each vertex of its
+territory divided by the total number of visits of the walk, as written
+in the text output. Every some steps the occupation is taken and kept
+in a window with the last samples. The rule "occupation" stops when no
+occupation changed more than a tolerance inside the window. The rule
+"support" stops when the support of the walks, the vertices where the
+occupation is above a threshold, and so the overlap of the supports of
+different walks, did not change inside the window.
+
+"""
+import numpy as np
+
+from walk import Walks
+
+RULES = ('occupation', 'support')
+
+class Convergence():
+    """Stopping rule evaluated over a sliding window of samples of the
+    occupation.
+
+    """
+    def __init__(self, rule='occupation', every=100, window=10, tol=1e-3,
+                 support=0.01):
+        """rule (str): "occupation" or "support"
+        every (int): steps between the samples
+        window (int): number of samples compared
+        tol (float): largest change of the occupation inside the window
+                     allowed to stop
+        support (float): smallest occupation of a vertex in the support
+                         of a walk
+
+        """
+        if rule not in RULES:
+            raise ValueError('unknown stopping rule "{}", it should be '
+                             'one of {}'.format(rule, ', '.join(RULES)))
+        if every < 1 or window < 2:
+            raise ValueError('the stopping rule needs every >= 1 and '
+                             'window >= 2')
+        self.rule = rule
+        self.every = every
+        self.window = window
+        self.tol = tol
+        self.support = support
+        self.reason = None
+        # Window of the run resumed, taken by the next start.
+        self._restored = None
+
+    def start(self, walks: Walks):
+        """Clear the samples, or take the ones restored from a checkpoint,
+        and follow the walks, called when the simulation starts.
+
+        """
+        self._walks = walks
+        # Walk of each cell of the territories.
+        self._rows = walks.rows()
+        self._samples = np.zeros((self.window, len(self._rows)))
+        self._nsamples = 0
+        if self._restored is not None:
+            self._samples[...], self._nsamples = self._restored
+            self._restored = None
+        self.reason = None
+
+    def settings(self) -> np.ndarray:
+        """Return the rule and the settings that make its samples, a run
+        is resumed only with the same ones.
+
+        """
+        return np.array([RULES.index(self.rule), self.every, self.window,
+                         self.tol, self.support])
+
+    def state(self) -> tuple[np.ndarray, int]:
+        """Return the window of samples and the number of samples taken.
+
+        """
+        return self._samples, self._nsamples
+
+    def restore(self, samples: np.ndarray, nsamples: int):
+        """Set the window of samples and the number of samples taken by
+        a run that is resumed, they replace the empty window at the next
+        start.
+
+        """
+        self._restored = (samples, nsamples)
+
+    def update(self, step: int) -> bool:
+        """Take a sample at the steps multiple of every and return True if
+        the simulation should stop at the step.
+
+        """
+        if step % self.every != 0:
+            return False
+        walks = self._walks
+        occ = walks.counts / walks.totals[self._rows]
+        # The samples are kept in a ring.
+        self._samples[self._nsamples % self.window] = occ
+        self._nsamples += 1
+        if self._nsamples < self.window:
+            return False
+        if self.rule == 'occupation':
+            change = float((self._samples.max(axis=0) -
+                            self._samples.min(axis=0)).max(initial=0.0))
+            if change >= self.tol:
+                return False
+            self.reason = 'occupation changed at most {:.3g} in {} steps' \
+                .format(change, self.every * (self.window - 1))
+        else:
+            supp = self._samples > self.support
+            if not (supp == supp[0]).all():
+                return False
+            self.reason = 'support unchanged in {} steps, {} vertices ' \
+                'shared by walks'.format(self.every * (self.window - 1),
+                                         self.shared(supp[0]))
+        return True
+
+    def shared(self, supp: np.ndarray) -> int:
+        """Return the number of vertices in the support of more than one
+        walk.
+
+        supp (np.ndarray): True for the cells of the territories in the
+                           support of their walk
+
+        """
+        nwalks = np.bincount(self._walks.cells[supp],
+                             minlength=self._walks.nvertices())
+        return int(np.count_nonzero(nwalks > 1))
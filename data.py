@@ -1,36 +1,168 @@
 """Handle data operations like writing to a file.
 
+The data can be written as text, with the number of visits of each walk
+in each vertex normalized by the total number of visits of the walk, or
+as binary, with the raw number of visits. The binary file is a NumPy
+.npy file with one row per step and one uint32 column per walk and
+vertex of its territory. A JSON header with the same name describes the
+walks, the vertices and the territories. The normalization is done when
+the file is read by Output. The summary output keeps only statistics of
+the steps written and saves them in a single record at the end.
+
 """
-from walk import Walk
+import json
+import os
+
+import numpy as np
+
+from sink import FNAMES, NPY_HEADER_SIZE, Sink, columns, file_sink, \
+    header_fname, normalize
+from walk import Walks
+
+def header(walks: Walks, stride=1) -> dict:
+    """Return the layout of the output of the walks: the number of walks
+    and vertices, the territory of each walk and the stride between the
+    steps written.
+
+    """
+    return {'walks': len(walks.locations),
+            'vertices': walks.nvertices(),
+            'territories': [cells.tolist() for cells in
+                            np.split(walks.cells, walks.indptr[1:-1])],
+            'stride': stride}
 
 class Data():
     """Wrapper to output data.
 
     """
-    def __init__(self, walks: list[Walk]):
+    def __init__(self, walks: Walks, fname=None, fmt='text', stride=1,
+                 sink=None, start=0):
+        """Open the output and write the current state of the walks, or
+        continue the output of a run resumed at the step start.
+
+        walks (Walks): walks whose visits are written
+        fname (str): name of the output file, rrwg.dat for text,
+                     rrwg.npy for binary and rrwg.npz for summary if
+                     not given
+        fmt (str): "text", "binary" or "summary"
+        stride (int): write only every stride-th step
+        sink (Sink): where the rows are written, a file named fname in
+                     the format fmt if not given
+        start (int): last step written by the resumed run, the rows
+                     after it are dropped from the output
+
+        """
+        if stride < 1:
+            raise ValueError('output stride must be at least 1')
         self._walks = walks
-        self._fname = 'rrwg.dat'
-        self._dataf = open(self._fname, 'w')
-        for i, walk in enumerate(walks):
-            for j in walk.vertices():
-                self._dataf.write('\tw{}v{}'.format(i, j))
-        self._dataf.write('\n')
-        self.write()
+        self._stride = stride
+        self._step = 0
+        self._sink = sink if sink is not None else file_sink(fname, fmt)
+        if start > 0:
+            self._sink.resume(header(walks, stride), start // stride + 1)
+            self._step = start + 1
+        else:
+            self._sink.open(header(walks, stride))
+            self.write()
 
     def __del__(self):
-        if self._dataf:
-            self._dataf.close()
-        print('* Wrote {}'.format(self._fname))
+        self.close()
+
+    @property
+    def sink(self) -> Sink:
+        """Return the sink where the rows are written.
+
+        """
+        return self._sink
+
+    @property
+    def stride(self) -> int:
+        """Return the stride between the steps written.
+
+        """
+        return self._stride
+
+    def note(self, key: str, value):
+        """Add an entry to the metadata of the output.
+
+        """
+        self._sink.note(key, value)
+
+    def flush(self):
+        """Wait until all rows written are in the output.
+
+        """
+        self._sink.flush()
+
+    def close(self):
+        """Finish the output.
+
+        """
+        if getattr(self, '_sink', None) is None:
+            return
+        self._sink.close()
+        self._sink = None
 
     def write(self):
         """Write the current data saved in walk list
         to the output file.
 
         """
-        for walk in self._walks:
-            allvis = walk.total_visits()
-            for i in walk.vertices():
-                vis = walk.nvisits(i)/allvis
-                self._dataf.write('\t{:.3f}'.format(vis))
-        self._dataf.write('\n')
-        self._dataf.flush()
+        step = self._step
+        self._step += 1
+        if step % self._stride != 0:
+            return
+        # The columns of the output are the cells of the walks, the sink
+        # receives a snapshot of the current step.
+        self._sink.write(step, self._walks.counts.copy())
+
+class Output():
+    """Reader of the binary output. The counts are memory-mapped and
+    normalized only when they are requested.
+
+    """
+    def __init__(self, fname=FNAMES['binary']):
+        """Open the binary output file and its header.
+
+        fname (str): name of the binary output file
+
+        """
+        with open(header_fname(fname)) as hdrf:
+            self.header = json.load(hdrf)
+        self.territories = self.header['territories']
+        # Walk and vertex of each column.
+        self.walk_ids, self.vertex_ids = columns(self.header)
+        dtype = np.dtype(self.header['dtype'])
+        ncols = len(self.vertex_ids)
+        # The number of rows comes from the file size, so a file
+        # whose run was interrupted can be read too.
+        nrows = (os.path.getsize(fname) - NPY_HEADER_SIZE) // \
+            (dtype.itemsize * ncols) if ncols else 0
+        self.counts = np.memmap(fname, dtype=dtype, mode='r',
+                                offset=NPY_HEADER_SIZE,
+                                shape=(nrows, ncols))
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    def steps(self) -> np.ndarray:
+        """Return the step of each row.
+
+        """
+        return np.arange(len(self)) * self.header['stride']
+
+    def occupation(self, start=0, stop=None) -> np.ndarray:
+        """Return the number of visits of each walk in each vertex of its
+        territory normalized by the total number of visits of the walk,
+        for the rows from start to stop.
+
+        """
+        return normalize(self.counts[start:stop], self.walk_ids)
+
+    def chunks(self, size=4096):
+        """Yield the number of visits of the rows in blocks of size rows,
+        only the rows of a block are read from the file.
+
+        """
+        for start in range(0, len(self), size):
+            yield np.asarray(self.counts[start:start+size])
@@ -0,0 +1,193 @@
+"""Graphs read from edge-list files.
+
+The edge list is a text file with one edge per line, the two vertices
+of the edge separated by spaces, or a .npy file with an edges x 2
+array of vertices. Lines starting with # or % are comments and the
+columns after the second are ignored. The vertices are numbered from
+zero and the edges are undirected. The file is read in chunks and the
+CSR arrays of the graph are saved in a cache file next to it, later
+runs map the cache into memory instead of reading the edges again.
+
+The territories of the walks are given by a label file with one line
+per vertex, the line i has the labels of the vertex i separated by
+spaces or commas. Each label is a walk whose territory is the vertices
+with the label.
+
+"""
+import itertools
+import os
+
+import numpy as np
+
+from graph import Graph
+
+# Number of lines or edges read at once.
+CHUNK = 1 << 20
+# Words before the CSR arrays in the cache: number of vertices, number
+# of neighbors, self-loops, size and modification time of the edges.
+CACHE_WORDS = 5
+
+def cache_fname(fname: str) -> str:
+    """Return the name of the cache of the CSR arrays of the edge list.
+
+    """
+    return fname + '.csr.npy'
+
+def read_edges(fname: str, chunk=CHUNK):
+    """Yield the edges of the file as arrays of vertex pairs, at most
+    chunk edges at a time.
+
+    """
+    if fname.endswith('.npy'):
+        edges = np.load(fname, mmap_mode='r')
+        if edges.ndim != 2 or edges.shape[1] != 2:
+            raise ValueError('the edges in {} should be an edges x 2 array'
+                             .format(fname))
+        for begin in range(0, len(edges), chunk):
+            yield np.asarray(edges[begin:begin+chunk], dtype=np.int64)
+        return
+    with open(fname) as edgef:
+        while True:
+            block = list(itertools.islice(edgef, chunk))
+            if not block:
+                break
+            lines = [line for line in block
+                     if line.strip() and line.lstrip()[0] not in '#%']
+            if lines:
+                yield np.loadtxt(lines, dtype=np.int64, usecols=(0, 1),
+                                 ndmin=2)
+
+def csr(edges: np.ndarray, nvertices: int,
+        self_loops=True) -> tuple[np.ndarray, np.ndarray]:
+    """Return the CSR arrays indptr and indices of the undirected graph
+    with the edges, without repeated edges.
+
+    edges (np.ndarray): edges x 2 array of vertices
+    nvertices (int): number of vertices
+    self_loops (bool): add a self-loop to each vertex
+
+    """
+    if len(edges) and (edges.min() < 0 or edges.max() >= nvertices):
+        raise ValueError('the edges have vertices out of 0..{}'
+                         .format(nvertices-1))
+    rows = [edges[:, 0], edges[:, 1]]
+    cols = [edges[:, 1], edges[:, 0]]
+    if self_loops:
+        rows.append(np.arange(nvertices))
+        cols.append(np.arange(nvertices))
+    # Sorting the pairs as single keys sorts the neighbors and puts
+    # the repeated edges together.
+    keys = np.unique(np.concatenate(rows) * nvertices + np.concatenate(cols))
+    indices = keys % nvertices
+    indptr = np.zeros(nvertices+1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // nvertices, minlength=nvertices),
+              out=indptr[1:])
+    return indptr, indices
+
+def reached(indptr: np.ndarray, indices: np.ndarray,
+            source=0) -> np.ndarray:
+    """Return a boolean array marking the vertices reached from the source
+    by a breadth-first search, which visits each vertex and edge once.
+
+    """
+    nverts = len(indptr) - 1
+    seen = np.zeros(nverts, dtype=bool)
+    if nverts == 0:
+        return seen
+    # Position of each vertex in the next frontier, to drop repetitions.
+    slot = np.zeros(nverts, dtype=np.int64)
+    seen[source] = True
+    frontier = np.array([source])
+    while len(frontier):
+        starts = indptr[frontier]
+        degrees = indptr[frontier+1] - starts
+        ends = np.cumsum(degrees)
+        pos = np.repeat(starts - (ends - degrees), degrees) + \
+            np.arange(ends[-1])
+        nbrs = indices[pos]
+        nbrs = nbrs[~seen[nbrs]]
+        seen[nbrs] = True
+        # Only the last occurrence of each vertex is kept.
+        slot[nbrs] = np.arange(len(nbrs))
+        frontier = nbrs[slot[nbrs] == np.arange(len(nbrs))]
+    return seen
+
+def check_connected(indptr: np.ndarray, indices: np.ndarray):
+    """Raise ValueError if the graph is not connected.
+
+    """
+    seen = reached(indptr, indices)
+    if not seen.all():
+        raise ValueError('the graph is not connected, {} of {} vertices '
+                         'are not reached from v0'
+                         .format(np.count_nonzero(~seen), len(seen)))
+
+def load(fname: str, nvertices=None, self_loops=True, cache=True,
+         chunk=CHUNK) -> Graph:
+    """Return the connected graph of the edge list.
+
+    fname (str): name of the edge-list file
+    nvertices (int): number of vertices, the largest vertex in the
+                     edges plus one if not given
+    self_loops (bool): add a self-loop to each vertex
+    cache (bool): map the CSR arrays from the cache file, written if
+                  it does not exist or is older than the edge list
+    chunk (int): number of lines or edges read at once
+
+    """
+    stat = os.stat(fname)
+    ident = [stat.st_size, stat.st_mtime_ns]
+    cname = cache_fname(fname)
+    if cache and os.path.exists(cname):
+        words = np.load(cname, mmap_mode='r')
+        nverts, nnz, loops = (int(w) for w in words[:3])
+        if words[3:CACHE_WORDS].tolist() == ident and \
+           loops == self_loops and nvertices in (None, nverts):
+            indptr = words[CACHE_WORDS:CACHE_WORDS+nverts+1]
+            indices = words[CACHE_WORDS+nverts+1:]
+            assert len(indices) == nnz
+            return Graph.from_csr(indptr, indices)
+
+    chunks = list(read_edges(fname, chunk))
+    edges = np.concatenate(chunks) if chunks \
+        else np.zeros((0, 2), dtype=np.int64)
+    del chunks
+    if nvertices is None:
+        nvertices = int(edges.max()) + 1 if len(edges) else 0
+    indptr, indices = csr(edges, nvertices, self_loops)
+    del edges
+    check_connected(indptr, indices)
+    if cache:
+        tmp = cname + '.tmp'
+        with open(tmp, 'wb') as cachef:
+            np.save(cachef, np.concatenate([
+                [nvertices, len(indices), int(self_loops)], ident,
+                indptr, indices]).astype(np.int64))
+        os.replace(tmp, cname)
+    indptr.setflags(write=False)
+    indices.setflags(write=False)
+    return Graph.from_csr(indptr, indices)
+
+def read_labels(fname: str, nvertices: int) -> list[np.ndarray]:
+    """Return the territory of each label in the label file, the labels
+    are sorted as numbers if all of them are integers.
+
+    fname (str): name of the label file
+    nvertices (int): number of vertices of the graph
+
+    """
+    terrs = {}
+    nlines = 0
+    with open(fname) as labf:
+        for vert, line in enumerate(labf):
+            for label in line.replace(',', ' ').split():
+                terrs.setdefault(label, []).append(vert)
+            nlines += 1
+    if nlines != nvertices:
+        raise ValueError('{} has {} lines, one per vertex of the graph '
+                         'with {} vertices was expected'
+                         .format(fname, nlines, nvertices))
+    labels = sorted(terrs)
+    if all(label.lstrip('-').isdigit() for label in labels):
+        labels.sort(key=int)
+    return [np.array(terrs[label], dtype=np.int64) for label in labels]
@@ -0,0 +1,104 @@
+"""Run independent replicas of the same simulation in a pool of
+processes.
+
+The graph, the initial state of the walks, the probability and the
+territory index are built once and handed to each worker process when
+it starts, only the replica number is sent with each task. Every
+replica draws its own streams of pseudo-random numbers, selected by
+the replica number, from the same seed and writes its own output and
+log files.
+
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import log
+from data import Data
+from graph import Graph
+from prob import Probability
+from simul import simulate
+from sink import FNAMES, file_sink
+from territory import Territory
+from walk import Walks
+
+# Setup of the simulation shared by the replicas of a worker.
+_shared = {}
+
+def replica_fname(fname: str, replica: int) -> str:
+    """Return the name of the file of a replica, the replica number is
+    added before the extension.
+
+    """
+    base, ext = os.path.splitext(fname)
+    return '{}-r{:04d}{}'.format(base, replica, ext)
+
+def _init_worker(shared: dict):
+    """Keep the setup of the simulation in the worker process.
+
+    """
+    _shared.update(shared)
+
+def run_replica(replica: int) -> str:
+    """Run one replica of the simulation with a fresh copy of the walks
+    and return the name of its output file.
+
+    replica (int): number of the replica
+
+    """
+    opts = _shared
+    fname = replica_fname(FNAMES[opts['fmt']], replica)
+    log.configure(opts['loglevel'],
+                  replica_fname(log.FNAME, replica))
+    log.info('replica={}', replica)
+    walks = opts['walks'].copy()
+    data = Data(walks, stride=opts['stride'],
+                sink=file_sink(fname, opts['fmt']))
+    simulate(opts['nsteps'], opts['graph'], walks, opts['prob'],
+             opts['seed'], territory=opts['territory'], data=data,
+             replica=replica, stop=opts['stop'])
+    log.close()
+    return fname
+
+def run(nreplicas: int, nworkers: int, nsteps: int, graph: Graph,
+        walks: Walks, prob: Probability, territory: Territory,
+        seed=None, fmt='text', stride=1, loglevel='info',
+        stop=None) -> list[str]:
+    """Run the replicas in a pool of worker processes and return the
+    names of their output files.
+
+    nreplicas (int): number of replicas
+    nworkers (int): number of worker processes, the number of CPUs if 0
+    nsteps (int): the number of steps to walk
+    graph (Graph): graph shared by the replicas
+    walks (Walks): initial state of the walks, it is not modified
+    prob (Probability): transition probability
+    territory (Territory): index of the walks allowed in each vertex
+    seed (int): seed of the ensemble
+    fmt (str): output format of the replicas
+    stride (int): write only every stride-th step
+    loglevel (str): log level of the replicas
+    stop (Convergence): stopping rule of each replica
+
+    """
+    # All replicas share the seed, taken from the system if not given.
+    seed = np.random.SeedSequence(seed).entropy
+    log.info('ensemble_entropy={}', seed)
+    shared = {'graph': graph, 'walks': walks, 'prob': prob,
+              'territory': territory, 'nsteps': nsteps,
+              'seed': seed, 'fmt': fmt,
+              'stride': stride, 'loglevel': loglevel, 'stop': stop}
+    # Nothing buffered may be inherited by the workers.
+    log.close()
+    sys.stdout.flush()
+    # Forked workers inherit the setup without pickling it.
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context('fork' if 'fork' in methods
+                                      else None)
+    with ProcessPoolExecutor(max_workers=nworkers or os.cpu_count(),
+                             mp_context=ctx, initializer=_init_worker,
+                             initargs=(shared,)) as pool:
+        return list(pool.map(run_replica, range(nreplicas)))
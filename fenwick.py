@@ -0,0 +1,124 @@
+"""Fenwick (binary indexed) trees of weights used to sample a vertex in
+logarithmic time.
+
+A forest keeps one tree per row of an array of weights in compressed
+sparse row (CSR) form, the rows may have different sizes and all trees
+are stored in a single array with the same layout of the weights: the
+node k of the tree of a row, counted from 1, is kept in the cell k-1 of
+the row. The point updates and the building of the trees are vectorized
+over the rows.
+
+"""
+import numpy as np
+
+class FenwickForest():
+    """One Fenwick tree of non-negative weights per row.
+
+    """
+    def __init__(self, weights: np.ndarray, indptr: np.ndarray):
+        """Build the trees of the rows of weights.
+
+        weights (np.ndarray): weights of the cells of all rows
+        indptr (np.ndarray): the row i has the cells indptr[i] to
+                             indptr[i+1]-1
+
+        """
+        self.values = np.array(weights, dtype=np.float64)
+        self._indptr = np.asarray(indptr, dtype=np.int64)
+        sizes = np.diff(self._indptr)
+        # Row, first cell of the row and node of each cell.
+        rows = np.repeat(np.arange(len(sizes)), sizes)
+        self._starts = self._indptr[rows]
+        self._nodes = np.arange(len(self.values)) - self._starts + 1
+        self._ends = self._indptr[1:][rows]
+        self._tree = np.zeros(len(self.values))
+        self.rebuild()
+
+    def rebuild(self):
+        """Build the trees again from the weights, which removes the
+        rounding accumulated by the updates.
+
+        """
+        tree = self._tree
+        tree[:] = self.values
+        nodes, ends = self._nodes, self._ends
+        cells = np.arange(len(tree))
+        step = 1
+        while len(cells):
+            # Nodes whose lowest bit is step add to their parents.
+            valid = ((nodes & (2*step - 1)) == step) & (cells + step < ends)
+            tree[cells[valid] + step] += tree[cells[valid]]
+            # The nodes below the next step have no more parents.
+            keep = nodes >= 2*step
+            nodes, ends, cells = nodes[keep], ends[keep], cells[keep]
+            step *= 2
+
+    def update(self, cells: np.ndarray, weights: np.ndarray):
+        """Set the weight of the cells, one cell per row.
+
+        cells (np.ndarray): cells updated, in different rows
+        weights (np.ndarray): new weight of each cell
+
+        """
+        delta = weights - self.values[cells]
+        self.values[cells] = weights
+        starts, ends = self._starts[cells], self._ends[cells]
+        idx = cells - starts + 1
+        while len(idx):
+            self._tree[starts + idx - 1] += delta
+            idx = idx + (idx & -idx)
+            valid = starts + idx <= ends
+            starts, ends = starts[valid], ends[valid]
+            idx, delta = idx[valid], delta[valid]
+
+    def total(self, row: int) -> float:
+        """Return the sum of the weights of the row.
+
+        """
+        start = self._indptr[row]
+        acc = 0.0
+        idx = int(self._indptr[row+1] - start)
+        while idx > 0:
+            acc += self._tree[start + idx - 1]
+            idx -= idx & -idx
+        return acc
+
+    def search(self, row: int, target: float) -> int:
+        """Return the cell of the row where the cumulative weight goes
+        beyond the target.
+
+        """
+        start = self._indptr[row]
+        size = int(self._indptr[row+1] - start)
+        tree = self._tree[start:start+size]
+        pos = 0
+        # Largest power of two not greater than the size.
+        step = 1 << (size.bit_length() - 1) if size else 0
+        while step:
+            nxt = pos + step
+            if nxt <= size and tree[nxt-1] <= target:
+                pos = nxt
+                target -= tree[nxt-1]
+            step >>= 1
+        return int(start) + min(pos, size-1)
+
+    def sample(self, row: int, uniform: float) -> int:
+        """Return a cell of the row chosen with probability proportional to
+        its weight, ValueError is raised if the weights of the row are
+        not finite or do not have a positive sum.
+
+        uniform (float): uniform number in [0, 1)
+
+        """
+        total = self.total(row)
+        if not 0.0 < total < np.inf:
+            raise ValueError('the weights of the row {} sum to {}, they '
+                             'must be finite and positive'
+                             .format(row, total))
+        cell = self.search(row, uniform * total)
+        if self.values[cell] <= 0.0:
+            # The rounding took the target to a cell without weight.
+            start = self._indptr[row]
+            cell = int(start + np.flatnonzero(
+                self.values[start:self._indptr[row+1]] > 0.0)[-1])
+        return cell
@@ -1,6 +1,11 @@
 """Graph data structure and methods. Only the functionality needed for
 RRWG is implemented.
 
+The neighbors are stored in compressed sparse row (CSR) form, built
+from the added edges the first time they are queried. The complete
+graph and the graph of partitions are implicit, their neighbors are
+calculated from the vertex index without storing any edge.
+
 """
 import numpy as np
 
@@ -17,59 +22,221 @@ class Graph():
         nvertices (int): number of vertices
         complete (bool): graph is complete?
         self_loops (bool): all vertices have self-loops?
+        partition_size (int): number of vertices in each partition
 
         """
-        self._adjs = {}
         self._n = nvertices
         self._complete = complete
         self._selfloops = self_loops
         self._partsize = partition_size
+        # All vertices, the neighbors are slices of it when possible.
+        self._verts = np.arange(self._n)
+        self._verts.setflags(write=False)
+        # Adjacency sets of the explicit edges.
+        self._adjs = None
+        # Offsets of the neighbors when the partitions are connected.
+        self._offsets = None
+        # CSR form of the adjacency sets.
+        self._indptr = None
+        self._indices = None
+        # Edges of the CSR form as sorted keys, to test adjacency.
+        self._keys = None
+        # Marks the offsets of the neighbors of the graph of partitions.
+        self._offset_mask = None
 
-        # Initialize
-        for i in range(self._n):
-            self._adjs[i] = []
-
+        # All graphs are undirected
+        if self._complete is True:
+            if not self._selfloops:
+                # All edges except the self-loops.
+                self._complete = False
+                offdiag = ~np.eye(self._n, dtype=bool)
+                self._indices = np.nonzero(offdiag)[1]
+                self._indptr = np.arange(0, self._n*(self._n-1)+1,
+                                         max(self._n-1, 1))[:self._n+1]
+            return
+
+        self._adjs = [set() for _ in range(self._n)]
         # Add self-loops
         if self._selfloops:
             for i in range(self._n):
                 self.add_edge(i, i)
 
-        # All graphs are undirected
-        if self._complete is True:
-            for i in range(self._n):
-                for j in range(self._n):
-                    if i==j:
-                        continue
-                    self.add_edge(i, j)
+    @classmethod
+    def from_csr(cls, indptr: np.ndarray, indices: np.ndarray) -> 'Graph':
+        """Create a graph from its CSR arrays. The indices of each vertex
+        must be sorted and the edges must appear in both directions.
+
+        indptr (np.ndarray): neighbors of vertex i are in
+                             indices[indptr[i]:indptr[i+1]]
+        indices (np.ndarray): neighbors of all vertices
+
+        """
+        graph = cls(len(indptr)-1, complete=False, self_loops=False)
+        graph._adjs = None
+        graph._indptr = indptr
+        graph._indices = indices
+        return graph
 
     def add_edge(self, i: int, j: int):
         """Add an edge in the graph from i to j.
 
         """
-        if j not in self._adjs[i]:
-            self._adjs[i].append(j)
-        if i not in self._adjs[j]:
-            self._adjs[j].append(i)
+        if self._complete:
+            # The edge already exists.
+            return
+        if self._adjs is None:
+            self.__materialize()
+        self._adjs[i].add(j)
+        self._adjs[j].add(i)
+        self._indptr = self._keys = None
+
+    def connect_partitions(self):
+        """Add an edge from each vertex i to all vertices in partition(i).
+        The graph of partitions is circulant and it is not stored.
+
+        """
+        if self._complete or self._partsize == 0:
+            return
+        if any(adj - {i} for i, adj in enumerate(self._adjs)):
+            # There are other edges besides the self-loops.
+            for i in range(self._n):
+                for j in self.partition(i):
+                    self.add_edge(i, j)
+            return
+        size = min(self._partsize, self._n)
+        offsets = np.unique(np.arange(-(size-1), size) % self._n)
+        self._offsets = offsets
+        self._offset_mask = np.zeros(self._n, dtype=bool)
+        self._offset_mask[offsets] = True
+        self._adjs = None
+        self._indptr = self._keys = None
+
+    def __materialize(self):
+        """Convert the current representation into adjacency sets to
+        receive new edges.
+
+        """
+        indptr, indices = self.csr()
+        self._adjs = [set(indices[indptr[i]:indptr[i+1]].tolist())
+                      for i in range(self._n)]
+        self._offsets = self._offset_mask = None
+        self._indptr = self._keys = None
+
+    def csr(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the CSR arrays indptr and indices of the graph, where the
+        neighbors of the vertex i are indices[indptr[i]:indptr[i+1]].
+
+        """
+        if self._indptr is not None:
+            return self._indptr, self._indices
+        if self._adjs is not None:
+            degrees = [len(adj) for adj in self._adjs]
+            indptr = np.zeros(self._n+1, dtype=np.int64)
+            np.cumsum(degrees, out=indptr[1:])
+            indices = np.fromiter((j for adj in self._adjs
+                                   for j in sorted(adj)),
+                                  dtype=np.int64, count=indptr[-1])
+            indptr.setflags(write=False)
+            indices.setflags(write=False)
+            self._indptr, self._indices = indptr, indices
+            return indptr, indices
+        # Implicit graphs are expanded without being cached.
+        deg = self._n if self._complete else len(self._offsets)
+        indptr = np.arange(0, self._n*deg+1, deg, dtype=np.int64)
+        indices = np.concatenate([self.neighbors(i) for i in range(self._n)]) \
+            if self._n else np.zeros(0, dtype=np.int64)
+        return indptr, indices
 
     def vertices(self) -> list[int]:
         """Return an ordered list of vertices in the graph. All vertices are
         represented as integers as indices that start from zero.
 
         """
-        return sorted(list(self._adjs.keys()))
+        return list(range(self._n))
 
-    def neighbors(self, vert: int) -> list[int]:
-        """Return an ordered list of vertices that are neighbors of the
-        current vertex.
+    def neighbors(self, vert: int) -> np.ndarray:
+        """Return an ordered array of vertices that are neighbors of the
+        current vertex. The array must not be modified.
+
+        """
+        if self._complete:
+            return self._verts
+        if self._offsets is not None:
+            if len(self._offsets) == self._n:
+                return self._verts
+            # Half of the window around the vertex.
+            half = (len(self._offsets)-1)//2
+            lo, hi = vert - half, vert + half + 1
+            if 0 <= lo and hi <= self._n:
+                return self._verts[lo:hi]
+            return np.sort(self._verts.take(range(lo, hi), mode='wrap'))
+        indptr, indices = self.csr()
+        return indices[indptr[vert]:indptr[vert+1]]
+
+    def neighbors_mask(self, verts) -> np.ndarray:
+        """Return a boolean matrix where the row i marks the neighbors of the
+        vertex verts[i].
+
+        verts (list[int]): vertices whose neighbors are marked
+
+        """
+        verts = np.asarray(verts, dtype=np.int64)
+        if self._complete:
+            return np.ones((len(verts), self._n), dtype=bool)
+        mask = np.zeros((len(verts), self._n), dtype=bool)
+        rows = np.arange(len(verts))
+        if self._offsets is not None:
+            cols = (verts[:, None] + self._offsets[None, :]) % self._n
+            mask[rows[:, None], cols] = True
+            return mask
+        indptr, indices = self.csr()
+        starts = indptr[verts]
+        degrees = indptr[verts+1] - starts
+        ends = np.cumsum(degrees)
+        pos = np.repeat(starts - (ends - degrees), degrees) + \
+            np.arange(ends[-1] if len(ends) else 0)
+        mask[np.repeat(rows, degrees), indices[pos]] = True
+        return mask
+
+    def adjacent(self, srcs, dests) -> np.ndarray:
+        """Return a boolean array marking the pairs where dests[i] is a
+        neighbor of srcs[i], the arrays are broadcast. Each pair takes
+        constant time in the implicit graphs and logarithmic time in the
+        number of edges otherwise.
+
+        srcs (np.ndarray): source vertices
+        dests (np.ndarray): destination vertices
+
+        """
+        srcs = np.asarray(srcs, dtype=np.int64)
+        dests = np.asarray(dests, dtype=np.int64)
+        if self._complete:
+            return np.ones(np.broadcast_shapes(srcs.shape, dests.shape),
+                           dtype=bool)
+        if self._offsets is not None:
+            return self._offset_mask[(dests - srcs) % self._n]
+        if self._keys is None:
+            indptr, indices = self.csr()
+            # The neighbors are sorted, so are the keys of the edges.
+            self._keys = np.repeat(np.arange(self._n), np.diff(indptr)) * \
+                self._n + indices
+        keys = srcs * self._n + dests
+        pos = np.minimum(np.searchsorted(self._keys, keys),
+                         max(len(self._keys)-1, 0))
+        return self._keys[pos] == keys if len(self._keys) \
+            else np.zeros(keys.shape, dtype=bool)
+
+    def is_complete(self) -> bool:
+        """Return True if the graph is complete with self-loops.
 
         """
-        return sorted(list(self._adjs[vert]))
+        return self._complete
 
     def order(self) -> int:
         """Return the number of vertices in the graph.
 
         """
-        return len(self._adjs)
+        return self._n
 
     def partition(self, begin_vertex: int) -> list[int]:
         """Return an ordered list of vertices starting at begin_vertex and
@@ -77,11 +244,10 @@ class Graph():
         number of partitions is zero, all vertices are returned.
 
         """
-        verts = self.vertices()
         if self._partsize == 0:
-            return verts
+            return self.vertices()
 
         inf = begin_vertex
         sup = self._partsize
-        return sorted(list(np.take(verts, range(inf, inf+sup),
-                                   mode='wrap')))
+        return sorted(np.take(self._verts, range(inf, inf+sup),
+                              mode='wrap').tolist())
@@ -0,0 +1,257 @@
+"""Long-lived runner of many small simulations read from a queue.
+
+A job is a configuration, the parameters of the [default] section of
+the configuration file, written as a JSON object on a line of the
+standard input or as a JSON or INI file in a queue directory. The jobs
+run in a pool of worker processes that are started once, so the
+interpreter, NumPy and the program are loaded only once, and each
+worker keeps the graphs, the initial walks and the territory indexes
+of the topologies it has built for the next jobs with the same
+topology. Every job writes its output, its log and its status to its
+own directory, and a JSON line with the status of each job is written
+to the standard output when the job ends.
+
+The files of the queue directory are claimed by moving them to the
+subdirectory running, so several runners may share the same queue,
+and they are moved to done or failed when the job ends.
+
+"""
+import configparser
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import log
+from simulation import configure, stopping
+from sink import FNAMES, file_sink
+
+DIRNAME = 'rrwg-jobs'
+# Status of the job, written in its directory when the job ends.
+STATUS_FNAME = 'status.json'
+# Extensions of the job files in a queue directory.
+EXTENSIONS = ('.json', '.conf', '.ini')
+# Subdirectories of the queue with the files of the jobs running and
+# ended.
+RUNNING, DONE, FAILED = 'running', 'done', 'failed'
+# Seconds between the scans of an empty queue that is watched.
+POLL = 1.0
+# Number of topologies kept by each worker.
+CACHE_SIZE = 16
+
+# Graphs, initial walks and territories built by the worker.
+_topologies = {}
+
+def parse(text: str) -> dict:
+    """Return the parameters of the job written as a JSON object or as an
+    INI configuration, whose [default] section header may be omitted.
+
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        spec = json.loads(text)
+        if not isinstance(spec, dict):
+            raise ValueError('the job is not a JSON object')
+        return {key: str(value) for key, value in spec.items()
+                if value is not None}
+    config = configparser.ConfigParser()
+    if not text.startswith('['):
+        text = '[default]\n' + text
+    config.read_string(text)
+    if 'default' not in config:
+        raise ValueError('the job has no [default] section')
+    return dict(config['default'])
+
+def _run(params: dict, jobdir: str) -> list[str]:
+    """Run the simulation of the job and return the names of the files
+    written.
+
+    """
+    config = configparser.ConfigParser()
+    config.read_dict({'default': params})
+    section = config['default']
+    if section.getint('replicas', fallback=1) != 1:
+        raise ValueError('a job runs a single replica')
+    if section.get('engine', 'process') != 'process':
+        raise ValueError('a job runs in the process engine')
+    output = section.get('output', 'text')
+    if output not in FNAMES:
+        raise ValueError('unknown output format "{}"'.format(output))
+    while len(_topologies) >= CACHE_SIZE:
+        # The oldest topology is dropped.
+        del _topologies[next(iter(_topologies))]
+    sim = configure(section, 'the job', _topologies)
+    stop = stopping(section)
+    sink = file_sink(os.path.join(jobdir, os.path.basename(FNAMES[output])),
+                     output)
+    log.info('dynamics={}', sim.dynamics)
+    sim.run(sink, section.getint('stride', fallback=1), stop=stop)
+    return [sink.fname]
+
+def run_job(job_id: str, params: dict, dirname=DIRNAME,
+            loglevel='info') -> dict:
+    """Run the job in its directory, write its status there and return
+    the status.
+
+    job_id (str): name of the directory of the job
+    params (dict): parameters of the simulation
+    dirname (str): directory with the directories of the jobs
+    loglevel (str): log level of the job
+
+    """
+    begin = time.perf_counter()
+    jobdir = os.path.join(dirname, job_id)
+    status = {'id': job_id, 'status': DONE, 'error': '', 'files': []}
+    try:
+        os.makedirs(jobdir, exist_ok=True)
+        log.configure(loglevel, os.path.join(jobdir, log.FNAME))
+        status['files'] = _run(params, jobdir)
+    # The worker goes on with the next job whatever the error.
+    except Exception as err: # pylint: disable=broad-except
+        status.update(status=FAILED, error=str(err) or type(err).__name__)
+    finally:
+        log.close()
+    status['seconds'] = round(time.perf_counter() - begin, 6)
+    if os.path.isdir(jobdir):
+        tmp = os.path.join(jobdir, STATUS_FNAME + '.tmp')
+        with open(tmp, 'w') as statf:
+            json.dump(status, statf)
+        os.replace(tmp, os.path.join(jobdir, STATUS_FNAME))
+    return status
+
+def _job(job_id: str, text: str, source=None) -> dict:
+    """Return the job with the parameters in the text, or with the error
+    found in them.
+
+    """
+    job = {'id': job_id, 'params': None, 'error': '', 'source': source}
+    try:
+        params = parse(text)
+        job['id'] = params.pop('id', job_id)
+        if not re.fullmatch(r'\w[\w.-]*', job['id']):
+            raise ValueError('invalid job id "{}"'.format(job['id']))
+        job['params'] = params
+    except (configparser.Error, ValueError) as err:
+        job['error'] = str(err)
+    return job
+
+def read_stream(stream) -> dict:
+    """Yield the jobs of the lines of the stream, a JSON object per line,
+    named job-NNNNNN by the line number if they have no "id".
+
+    """
+    for lineno, line in enumerate(stream, 1):
+        if line.strip() and not line.lstrip().startswith('#'):
+            yield _job('job-{:06d}'.format(lineno), line)
+
+def read_queue(dirname: str, watch=False) -> dict:
+    """Yield the jobs of the files of the queue directory, named by the
+    file if they have no "id", after claiming them. If the queue is
+    watched, None is yielded when it is empty, otherwise the jobs end
+    when it is empty.
+
+    """
+    for sub in (RUNNING, DONE, FAILED):
+        os.makedirs(os.path.join(dirname, sub), exist_ok=True)
+    while True:
+        names = sorted(name for name in os.listdir(dirname)
+                       if name.endswith(EXTENSIONS))
+        for name in names:
+            claimed = os.path.join(dirname, RUNNING, name)
+            try:
+                os.rename(os.path.join(dirname, name), claimed)
+            except FileNotFoundError:
+                # Claimed by another runner.
+                continue
+            try:
+                with open(claimed) as jobf:
+                    text = jobf.read()
+            except (OSError, UnicodeDecodeError) as err:
+                job = _job(os.path.splitext(name)[0], '', claimed)
+                job['error'] = str(err)
+                yield job
+                continue
+            yield _job(os.path.splitext(name)[0], text, claimed)
+        if not names:
+            if not watch:
+                return
+            yield None
+
+def _finish(job: dict, status: dict, stream):
+    """Write the status line of the job and move its file to the queue of
+    the jobs ended.
+
+    """
+    stream.write(json.dumps(status) + '\n')
+    stream.flush()
+    if job['source'] is not None:
+        queue = os.path.dirname(os.path.dirname(job['source']))
+        os.replace(job['source'], os.path.join(queue, status['status'],
+                                               os.path.basename(
+                                                   job['source'])))
+
+def run(jobs, nworkers=0, dirname=DIRNAME, loglevel='info',
+        stream=None) -> int:
+    """Run the jobs in a pool of worker processes and return the number of
+    jobs that failed.
+
+    jobs (iterable): jobs from read_stream or read_queue, None when
+                     there is no job for now
+    nworkers (int): number of worker processes, the number of CPUs if 0
+    dirname (str): directory with the directories of the jobs
+    loglevel (str): log level of the jobs
+    stream (file): where the status lines are written, the standard
+                   output if None
+
+    """
+    nworkers = nworkers or os.cpu_count()
+    stream = stream or sys.stdout
+    nfailed = 0
+    pending = {}
+
+    def report(futures):
+        nonlocal nfailed
+        for future in futures:
+            job = pending.pop(future)
+            try:
+                status = future.result()
+            except BrokenProcessPool:
+                raise RuntimeError('a worker of the job runner failed') \
+                    from None
+            nfailed += status['status'] == FAILED
+            _finish(job, status, stream)
+
+    os.makedirs(dirname, exist_ok=True)
+    # Forked workers start with the modules loaded, and nothing buffered
+    # may be inherited by them.
+    log.close()
+    sys.stdout.flush()
+    ctx = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=nworkers, mp_context=ctx) as pool:
+        for job in jobs:
+            if job is None:
+                # The queue is empty for now.
+                if pending:
+                    report(wait(pending, timeout=POLL,
+                                return_when=FIRST_COMPLETED).done)
+                else:
+                    time.sleep(POLL)
+                continue
+            if job['error']:
+                nfailed += 1
+                _finish(job, {'id': job['id'], 'status': FAILED,
+                              'error': job['error'], 'files': [],
+                              'seconds': 0.0}, stream)
+                continue
+            pending[pool.submit(run_job, job['id'], job['params'],
+                                dirname, loglevel)] = job
+            # A few jobs wait for each worker, the others are read
+            # only when there is room for them.
+            while len(pending) >= 2 * nworkers:
+                report(wait(pending, return_when=FIRST_COMPLETED).done)
+        report(wait(pending).done)
+    return nfailed
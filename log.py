@@ -1,11 +1,99 @@
 """Log facility.
 
+The messages have levels: info for the parameters of the run, debug
+for each step and trace for each probability calculation. A message is
+formatted only if its level is enabled, and the log file is opened,
+with a large buffer, when the first message is written. Nothing is
+logged until the level is set by configure().
+
 """
+import atexit
+
+OFF, INFO, DEBUG, TRACE = range(4)
+LEVELS = {'off': OFF, 'info': INFO, 'debug': DEBUG, 'trace': TRACE}
+
 FNAME = 'rrwg.log'
-logf = open(FNAME, 'w')
+BUFSIZE = 1 << 20
+
+_level = OFF
+_fname = FNAME
+_logf = None
+# The file is truncated when it is opened for the first time, unless
+# it is configured to append.
+_mode = 'w'
+
+def configure(level='info', fname=FNAME, append=False):
+    """Set the log level and the log file name.
+
+    level (str): one of "off", "info", "debug" or "trace"
+    fname (str): name of the log file
+    append (bool): append to the log file instead of truncating it,
+                   as the log of a resumed run
+
+    """
+    global _level, _fname, _mode
+    if level not in LEVELS:
+        raise ValueError('unknown log level "{}", it should be one of {}'
+                         .format(level, ', '.join(LEVELS)))
+    close()
+    _level = LEVELS[level]
+    _fname = fname
+    _mode = 'a' if append else 'w'
+
+def enabled(level: int) -> bool:
+    """Return True if the messages of the level are written.
+
+    """
+    return level <= _level
+
+def _write(content, args):
+    """Format the content with the arguments and write it to the log
+    file.
+
+    """
+    global _logf, _mode
+    if _logf is None:
+        _logf = open(_fname, _mode, buffering=BUFSIZE)
+        _mode = 'a'
+    if args:
+        content = content.format(*args)
+    _logf.write(content)
+    _logf.write('\n')
+
+def info(content, *args):
+    """Write a message about the whole run.
+
+    """
+    if _level >= INFO:
+        _write(content, args)
+
+def debug(content, *args):
+    """Write a message about a step of the simulation.
+
+    """
+    if _level >= DEBUG:
+        _write(content, args)
+
+def trace(content, *args):
+    """Write a message about a single probability calculation.
+
+    """
+    if _level >= TRACE:
+        _write(content, args)
+
 def write(content):
     """Write the content to log file.
 
     """
-    logf.write('{}\n'.format(content))
-    logf.flush()
+    info(content)
+
+def close():
+    """Flush and close the log file.
+
+    """
+    global _logf
+    if _logf is not None:
+        _logf.close()
+        _logf = None
+
+atexit.register(close)
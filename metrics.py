@@ -0,0 +1,126 @@
+"""Time spent in each phase of the step loop and progress of the run.
+
+The simulation marks the end of each phase of a step, the time since
+the previous mark is added to the phase. Every some seconds a progress
+line with the step, the steps per second, the estimated time to finish
+and the peak memory is written to the standard error, and at the end
+of the run the time of the phases is written as a JSON report. When
+the profile is disabled the marks do nothing.
+
+"""
+import json
+import os
+import resource
+import sys
+import time
+
+def report_fname(fname: str) -> str:
+    """Return the name of the profile report of the output file.
+
+    """
+    return os.path.splitext(fname)[0] + '-profile.json'
+
+def peak_rss() -> int:
+    """Return the peak resident memory of the process in KiB.
+
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The peak is in bytes on macOS.
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+class NullProfile():
+    """Profile that measures nothing, used when profiling is disabled.
+
+    """
+    def start(self, step: int):
+        """Start the measures at the step."""
+
+    def mark(self, phase: str):
+        """End the phase."""
+
+    def step(self, step: int):
+        """End the step."""
+
+    def finish(self):
+        """End the run."""
+
+class Profile(NullProfile):
+    """Accumulate the time and the number of calls of each phase.
+
+    """
+    def __init__(self, nsteps: int, progress=0.0, fname=None,
+                 stream=None):
+        """nsteps (int): last step of the run
+        progress (float): seconds between the progress lines, 0 for
+                          no progress lines
+        fname (str): name of the JSON report, no report if None
+        stream (file): where the progress lines are written,
+                       sys.stderr if not given
+
+        """
+        self.nsteps = nsteps
+        self.progress = progress
+        self.fname = fname
+        self._stream = stream
+        self.seconds = {}
+        self.calls = {}
+        self.first = self.last_step = self._shown_step = 0
+        self._begin = self._last = self._shown = time.perf_counter()
+
+    def start(self, step: int):
+        self.first = self.last_step = self._shown_step = step
+        self._begin = self._last = self._shown = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - self._last
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self._last = now
+
+    def step(self, step: int):
+        self.last_step = step
+        if self.progress and self._last - self._shown >= self.progress:
+            self._shown = self._last
+            self.show()
+
+    def rate(self) -> float:
+        """Return the steps per second since the start.
+
+        """
+        elapsed = self._last - self._begin
+        return (self.last_step - self.first) / elapsed if elapsed else 0.0
+
+    def show(self):
+        """Write a progress line.
+
+        """
+        self._shown_step = self.last_step
+        rate = self.rate()
+        eta = (self.nsteps - self.last_step) / rate if rate else 0.0
+        stream = self._stream or sys.stderr
+        stream.write('step {}/{} {:.1f} steps/s ETA {:.0f}s peak {} MiB\n'
+                     .format(self.last_step, self.nsteps, rate, eta,
+                             peak_rss() // 1024))
+        stream.flush()
+
+    def report(self) -> dict:
+        """Return the measures of the run.
+
+        """
+        elapsed = self._last - self._begin
+        return {'steps': self.last_step - self.first,
+                'seconds': elapsed,
+                'steps_per_sec': self.rate(),
+                'peak_rss_kb': peak_rss(),
+                'phases': {phase: {'seconds': secs,
+                                   'calls': self.calls[phase],
+                                   'fraction': secs / elapsed
+                                               if elapsed else 0.0}
+                           for phase, secs in self.seconds.items()}}
+
+    def finish(self):
+        if self.progress and self._shown_step != self.last_step:
+            self.show()
+        if self.fname is not None:
+            with open(self.fname, 'w') as repf:
+                json.dump(self.report(), repf, indent=1)
@@ -0,0 +1,203 @@
+"""Simulate a single large run with the walks split among processes.
+
+The number of visits, the totals and the locations of the walks and
+their next vertices are kept in shared memory. Each worker process owns
+a contiguous range of walks, with about the same number of territory
+cells in each range, and every step runs in phases separated by
+barriers: the workers calculate the transition probabilities of their
+walks and sample the next vertices, then they commit the visits of
+their walks while this process adds the visits of each vertex, and then
+this process writes the output and checks the stopping rule while the
+workers wait for the next step. All walks move at once from the state
+of the previous step and the numbers of each walk come from its own
+stream, so the result is the same of simul.simulate with the same seed.
+
+"""
+import multiprocessing
+import os
+import sys
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import log
+import metrics
+from data import Data
+from graph import Graph
+from prob import Probability
+from rng import Streams, sample_cells
+from simul import _stop
+from sink import MemorySink
+from territory import Territory
+from walk import Walks
+
+# Arrays of the walks kept in shared memory during the run.
+SHARED = ('counts', 'totals', 'locations', 'vertex_totals')
+
+def share(arrays: dict) -> tuple[list, dict]:
+    """Copy the arrays to new blocks of shared memory and return the
+    blocks and the arrays in them.
+
+    """
+    blocks, shared = [], {}
+    for name, arr in arrays.items():
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(arr.nbytes, 1))
+        shared[name] = np.ndarray(arr.shape, dtype=arr.dtype,
+                                  buffer=block.buf)
+        shared[name][...] = arr
+        blocks.append(block)
+    return blocks, shared
+
+def split(territory: Territory, nworkers: int) -> np.ndarray:
+    """Return the bounds of the ranges of walks of the workers, the worker
+    k owns the walks bounds[k] to bounds[k+1]-1.
+
+    """
+    cum = territory.indptr()[1:]
+    bounds = np.searchsorted(cum, cum[-1] * np.arange(1, nworkers) /
+                             nworkers, side='right')
+    return np.unique(np.concatenate([[0], bounds, [len(cum)]]))
+
+def _work(shm: dict, first: int, last: int, steps: range, graph: Graph,
+          prob: Probability, territory: Territory, entropy: int,
+          replica: int, barrier, running):
+    """Move the walks first to last-1 at each step of the run, the shared
+    arrays are inherited from the parent process.
+
+    """
+    try:
+        lo, hi = territory.indptr()[[first, last]]
+        counts, locs = shm['counts'][lo:hi], shm['locations']
+        dests = shm['dests'][first:last]
+        cells = territory.cells()[lo:hi]
+        groups = territory.groups(first, last)
+        streams = Streams(entropy, replica)
+        for i in steps:
+            barrier.wait()
+            if not running.value:
+                break
+            probs = prob.state_transitions(counts, shm['vertex_totals'],
+                                           locs[first:last], graph,
+                                           territory, slice(first, last))
+            pos = sample_cells(probs, groups,
+                               streams.uniforms(i, last-first, first=first))
+            dests[:] = cells[pos]
+            barrier.wait()
+            counts[pos] += 1
+            shm['totals'][first:last] += 1
+            locs[first:last] = dests
+            barrier.wait()
+    except BaseException:
+        # The other processes would wait for this one forever.
+        barrier.abort()
+        raise
+
+def simulate_parallel(nsteps: int, graph: Graph,
+                      walks: Walks, prob: Probability,
+                      seed=None, check=False, territory=None, data=None,
+                      replica=0, start=0, checkpoint=None, stop=None,
+                      profile=None, nworkers=0):
+    """Start the synchronous walking with the walks split among worker
+    processes, stopping after a number of steps or when the stopping
+    rule is met. The arguments are the same of simul.simulate.
+
+    nworkers (int): number of worker processes, the number of CPUs if 0
+
+    """
+    if territory is None:
+        territory = Territory(walks)
+    bounds = split(territory, nworkers or os.cpu_count())
+    log.info('workers={}', len(bounds)-1)
+    streams = Streams(seed, replica)
+    log.info('entropy={}', streams.entropy)
+
+    if data is None:
+        data = Data(walks, sink=MemorySink())
+    blocks, shm = share(dict({name: getattr(walks, name)
+                              for name in SHARED},
+                             dests=walks.locations))
+    # The walks see the shared state during the run.
+    private = {name: getattr(walks, name) for name in SHARED}
+    for name in SHARED:
+        setattr(walks, name, shm[name])
+    if checkpoint is not None:
+        checkpoint.start(walks, data, stop)
+    if stop is not None:
+        stop.start(walks)
+    if profile is None:
+        profile = metrics.NullProfile()
+
+    # Forked workers inherit the setup and the mapping of the shared
+    # memory without pickling them, and nothing buffered may be
+    # inherited by them.
+    log.close()
+    sys.stdout.flush()
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(len(bounds))
+    running = ctx.Value('b', 1, lock=False)
+    steps = range(start+1, nsteps+1)
+    workers = [ctx.Process(target=_work,
+                           args=(shm, first, last, steps, graph, prob,
+                                 territory, streams.entropy, replica,
+                                 barrier, running))
+               for first, last in zip(bounds[:-1], bounds[1:])]
+    for worker in workers:
+        worker.start()
+    try:
+        profile.start(start)
+        for i in steps:
+            log.debug('t={}', i)
+            barrier.wait()
+            # The workers sample the next vertices of their walks.
+            barrier.wait()
+            profile.mark('sample')
+            # The visits of the vertices are added while the workers
+            # commit the visits of their walks.
+            np.add.at(walks.vertex_totals, shm['dests'], 1)
+            barrier.wait()
+            profile.mark('visit')
+            if check:
+                walks.check()
+                profile.mark('check')
+
+            data.write()
+            profile.mark('write')
+            profile.step(i)
+            if stop is not None:
+                done = stop.update(i)
+                profile.mark('stop')
+                if done:
+                    _stop(data, i, stop.reason)
+                    if i < nsteps:
+                        # The workers wait for the next step, after the
+                        # last one they have already left.
+                        running.value = 0
+                        barrier.wait()
+                    break
+            # The checkpoint has the sample of the stopping rule taken
+            # at the step.
+            if checkpoint is not None:
+                checkpoint.update(i, streams.entropy)
+                profile.mark('checkpoint')
+    except threading.BrokenBarrierError:
+        raise RuntimeError('a worker of the parallel engine failed') \
+            from None
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+        for name in SHARED:
+            setattr(walks, name, private[name])
+            private[name][...] = shm[name]
+        del shm
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    data.close()
+    profile.mark('close')
+    profile.finish()
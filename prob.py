@@ -4,25 +4,32 @@ u, taking into account the number of visits of the other walks in the
 vertex v. The walk w tends to go to the vertex less visited by the
 other walks.
 
+The transition functions are registered by name with register(), each
+one as an array kernel over the normalized visits of the walks and of
+the other walks, with its parameters and their defaults and bounds, so
+every function runs on the same batched path of the simulation.
+
 """
-import math
-import sys
+import numpy as np
 
-from log import write as logwrite
-from walk import Walk
+from graph import Graph
+import log
+from territory import Territory
+from walk import Walk, Walks, row_sums
 
 def vertex_count_visits(walks: list[Walk], vert: int) -> int:
     """Count the number of visits of all walks in the specified vertex.
+    The count is read from the vertex totals that are kept up to date
+    in the walks state at each visit.
 
-    walks list[Walks]: list of Walk objects
+    walks list[Walks]: list of Walk objects allowed to visit vert
     vert (int): vertex to count the visits
 
     """
-    acc = 0
-    for i, walk in enumerate(walks):
-        nvis = walk.nvisits(vert)
-        acc += nvis
-        logwrite('\t\tvisits(w{}, v{})={}'.format(i, vert, nvis))
+    if len(walks) == 0:
+        return 0
+    acc = walks[0].walks.count_vertex_visits(vert)
+    log.trace('\t\tvisits(v{})={}', vert, acc)
     return acc
 
 def sum_norm_vertex_visits_from_other_walks(walks: list[Walk], \
@@ -49,32 +56,117 @@ def sum_norm_vertex_visits_from_other_walks(walks: list[Walk], \
 
         norm_nvis = \
             float(walk.nvisits(vert)) / total_nvis
-        logwrite('\t\tother_ws_norm_visits(w{}, v{})={:.2f}'
-                 .format(i, vert, norm_nvis))
+        log.trace('\t\tother_ws_norm_visits(w{}, v{})={:.2f}',
+                  i, vert, norm_nvis)
         acc += norm_nvis
 
     return acc, total_nvis
 
+class Function():
+    """Transition function declared as an array kernel with its parameters.
+
+    """
+    def __init__(self, name: str, kernel, params: dict, bounds: dict):
+        """name (str): name of the function in rrwg.conf
+        kernel (function): calculates the non-normalized weights from the
+                           arrays nvw, others and nwalks and the
+                           parameters given as keywords
+        params (dict): default value of each parameter
+        bounds (dict): smallest and largest value of the parameters,
+                       None for no bound
+
+        """
+        self.name = name
+        self.kernel = kernel
+        self.params = params
+        self.bounds = bounds
+
+    def check(self, param: str, value: float):
+        """Raise ValueError if the function has no such parameter, besides
+        the COMMON ones, or the value is out of its bounds.
+
+        """
+        if param not in self.params and param not in COMMON:
+            raise ValueError('function {} has no parameter "{}", it has {}'
+                             .format(self.name, param,
+                                     ', '.join(self.params) or 'none'))
+        low, high = self.bounds.get(param, (None, None))
+        if (low is not None and value < low) or \
+           (high is not None and value > high):
+            raise ValueError('parameter {}={} of function {} is out of '
+                             '[{}, {}]'.format(param, value, self.name,
+                                               low, high))
+
+# Transition functions by name, filled by register().
+FUNCTIONS = {}
+# Parameters accepted by every function, for the configuration files
+# written before the registry, and ignored by the functions that do not
+# declare them.
+COMMON = ('alpha', 'epsilon')
+
+def register(name: str, params=None, bounds=None):
+    """Return a decorator that registers the kernel as the transition
+    function with the name. The kernel receives, for each walk and
+    vertex, the number of visits of the walk normalized by the total of
+    the vertex (nvw), the sum of the normalized visits of the other walks
+    (others) and the number of walks allowed in the vertex (nwalks), all
+    as arrays that broadcast, and the parameters as keywords. It returns
+    the non-normalized transition weights.
+
+    name (str): name of the function in rrwg.conf, case insensitive
+    params (dict): default value of each parameter of the kernel
+    bounds (dict): smallest and largest value of each parameter, None
+                   for no bound, the parameters are unbounded if not
+                   given
+
+    """
+    def decorator(kernel):
+        FUNCTIONS[name.upper()] = Function(name.upper(), kernel,
+                                           dict(params or {}),
+                                           dict(bounds or {}))
+        return kernel
+    return decorator
+
+@register('EXP', params={'alpha': 1.0}, bounds={'alpha': (0.0, None)})
+def exp_kernel(nvw, others, nwalks, alpha):
+    """Apply the exponential function to the normalized visits of the other
+    walks and the reinforcing factor alpha.
+
+    """
+    return np.exp(-alpha * others)
+
+@register('POW', params={'alpha': 1.0, 'epsilon': 0.0},
+          bounds={'alpha': (0.0, None), 'epsilon': (0.0, 1.0)})
+def pow_kernel(nvw, others, nwalks, alpha, epsilon):
+    """Apply a factor to a power function of the normalized visits and the
+    reinforcing factor alpha.
+
+    """
+    return nvw * np.power(nwalks - epsilon*nvw - others, alpha)
+
 class Probability():
     """Transition probability class.
 
     """
-    def __init__(self, function='EXP'):
-        """Initialize probability object with the reinforced factor alpha and
-        the function chosen to be used in the calculation.
+    def __init__(self, function='EXP', **params):
+        """Initialize probability object with the function chosen to be
+        used in the calculation and the values of its parameters, the
+        parameters not given have their default values.
+
+        function (str): name of a registered function
+        params (float): values of the parameters of the function
 
         """
         self._funcname = function.upper()
-        if self._funcname == 'EXP':
-            self.__func = self.__exp
-        elif self._funcname == 'POW':
-            self.__func = self.__pow
-        else:
-            sys.exit('panic: unknown function \"{}\"'.format(function))
-
-        # Set some default values for alpha and epsilon
-        self._alpha = 1.0
-        self._epsilon = 0.0
+        if self._funcname not in FUNCTIONS:
+            raise ValueError('unknown function "{}", it should be one of {}'
+                             .format(function, ', '.join(FUNCTIONS)))
+        self._function = FUNCTIONS[self._funcname]
+        # Values of all parameters, the kernel receives only the ones
+        # it declares. The COMMON ones may be set for any function.
+        self._params = {'alpha': 1.0, 'epsilon': 0.0}
+        self._params.update(self._function.params)
+        self.set_params(**params)
 
     def function_name(self):
         """Get the name of the function used in the transition probability
@@ -83,78 +175,150 @@ class Probability():
         """
         return self._funcname
 
+    def params(self) -> dict:
+        """Return the values of the parameters of the function.
+
+        """
+        return {name: self._params[name] for name in self._function.params}
+
+    def set_params(self, **params):
+        """Set the values of parameters of the function, ValueError is
+        raised if the function has no such parameter or the value is out
+        of its bounds.
+
+        """
+        for name, value in params.items():
+            self._function.check(name, value)
+        self._params.update(params)
+
     @property
     def alpha(self):
         """Get the value of alpha.
 
         """
-        return self._alpha
+        return self._params['alpha']
 
     @alpha.setter
     def alpha(self, value):
-        """Set the value for alpha.
+        """Set the value for alpha, checked against its bounds.
 
         """
-        self._alpha = value
+        self.set_params(alpha=value)
 
     @property
     def epsilon(self):
         """Get the value of epsilon.
 
         """
-        return self._epsilon
+        return self._params['epsilon']
 
     @epsilon.setter
     def epsilon(self, value):
-        """Set the value for epsilon.
+        """Set the value for epsilon, checked against its bounds.
 
         """
-        self._epsilon = value
+        self.set_params(epsilon=value)
 
-    def __exp(self, walks: list[Walk], cur_walk: Walk, vert: int):
-        """Apply the exponential function to the number of visits and the
-        reinforcing factor alpha.
+    def __weights(self, nvw, others, nwalks):
+        """Apply the kernel of the function to the normalized visits of the
+        walks, the normalized visits from the other walks and the number
+        of walks allowed in each vertex.
 
         """
-        acc, _ = \
-            sum_norm_vertex_visits_from_other_walks(walks, cur_walk,
-                                                    vert)
-
-        prob = math.exp(-self._alpha * acc)
-
-        return prob
+        return self._function.kernel(nvw, others, nwalks, **self.params())
 
-    def __pow(self, walks: list[Walk], cur_walk: Walk, vert: int):
-        """Apply a factor to a power function of the number of visits and the
-        reinforcing factor alpha.
+    def cell_weights(self, counts, total_nvis, nwalks) -> np.ndarray:
+        """Calculate the non-normalized transition weights of walks to
+        vertices given, for each pair, the number of visits of the walk
+        in the vertex, the total number of visits in the vertex and the
+        number of walks allowed in it. The arguments are broadcast.
 
         """
-        acc, total_nvis = \
-            sum_norm_vertex_visits_from_other_walks(walks, cur_walk,
-                                                    vert)
-
-        # Normalized number of visits of the current walk.
-        nvw = cur_walk.nvisits(vert) / total_nvis
-
-        logwrite('\t  Pr=pow({} - {}*{:.2f} - {:.2f}, {})'
-                 .format(len(walks), self._epsilon, nvw,
-                         acc, self._alpha))
-
-        prob = nvw * pow(len(walks) - self._epsilon*nvw - acc,
-                         self._alpha)
+        counts = np.asarray(counts, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Normalized number of visits of each walk.
+            nvw = counts / total_nvis
+            # The sum of the normalized visits from all other walks is
+            # (total - own)/total.
+            others = (total_nvis - counts) / total_nvis
+            return self.__weights(nvw, others, nwalks)
+
+    def transitions(self, walks: Walks, graph: Graph,
+                    territory: Territory) -> np.ndarray:
+        """Calculate the transition probabilities of all walks for one step.
+        The cells of the walk i, in the CSR form of territory.cells(),
+        have the probability of the walk to go from its current location
+        to each vertex of its territory.
+
+        walks (Walks): state of the walks
+        graph (Graph): graph where the walks are walking
+        territory (Territory): index of the walks allowed in each vertex
 
-        return prob
+        """
+        return self.state_transitions(walks.counts, walks.vertex_totals,
+                                      walks.locations, graph, territory)
+
+    def state_transitions(self, counts: np.ndarray,
+                          vertex_totals: np.ndarray, locations: np.ndarray,
+                          graph: Graph, territory: Territory,
+                          walk_ids=slice(None)) -> np.ndarray:
+        """Calculate the transition probabilities of the walks from the
+        arrays of their state, which may have a leading axis of replicas.
+        Only the vertices of the territories are touched, so a step takes
+        time proportional to the total size of the territories.
+
+        counts (np.ndarray): number of visits of the walks in the cells
+                             of their territories, in the CSR form of
+                             territory.cells()
+        vertex_totals (np.ndarray): total number of visits in each vertex
+        locations (np.ndarray): current location of each walk
+        graph (Graph): graph where the walks are walking
+        territory (Territory): index of the walks allowed in each vertex
+        walk_ids (slice): walks whose probabilities are calculated, the
+                          counts and the locations have only these walks
+
+        ValueError is raised if the weights of a walk are not finite or
+        do not have a positive sum, as no destination can be sampled.
 
-    def calculate(self, walks: list[Walk], cur_walk: Walk, \
-                  v_dest: int) -> float:
+        """
+        first, last, _ = walk_ids.indices(len(territory.indptr()) - 1)
+        indptr = territory.indptr()[first:last+1]
+        cells = territory.cells()[indptr[0]:indptr[-1]]
+        rows = territory.rows()[indptr[0]:indptr[-1]] - first
+        probs = self.cell_weights(counts,
+                                  vertex_totals[..., cells],
+                                  territory.nwalks()[cells])
+        allowed = graph.adjacent(locations[..., rows], cells)
+        probs = np.where(allowed, probs, 0.0)
+        sums = row_sums(probs, indptr - indptr[0])
+        invalid = ~(np.isfinite(sums) & (sums > 0.0))
+        if invalid.any():
+            wid = np.argwhere(invalid)[0]
+            raise ValueError('the transition weights of w{} sum to {}, '
+                             'they must be finite and positive'
+                             .format(first + wid[-1], sums[tuple(wid)]))
+        probs /= sums[..., rows]
+        return probs
+
+    def calculate(self, walks: Walks, cur_walk: Walk, \
+                  v_dest: int, territory: Territory) -> float:
         """Calculate the transition probability of the current walk that are
         located at source vertex to go to destination vertex.
 
         walks (Walks): Walks object to access data
         from each walk
         cur_walk (Walk): current walk
-        v_src (int): source vertex
         v_dest (int): destination vertex
+        territory (Territory): index of the walks allowed in each vertex,
+        only these walks are taken into account
 
         """
-        return self.__func(walks, cur_walk, v_dest)
+        mates = [walks[i] for i in territory.walks(v_dest)]
+        acc, total_nvis = \
+            sum_norm_vertex_visits_from_other_walks(mates, cur_walk,
+                                                    v_dest)
+        # Normalized number of visits of the current walk.
+        nvw = cur_walk.nvisits(v_dest) / total_nvis
+        log.trace('\t  Pr={}(nvw={:.2f}, others={:.2f}, nwalks={})',
+                  self._funcname, nvw, acc, len(mates))
+        return float(self.__weights(nvw, acc, len(mates)))
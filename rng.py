@@ -0,0 +1,143 @@
+"""Pseudo-random numbers and sampling of the next vertex.
+
+Each walk has its own counter-based stream: the uniform number of the
+walk w at the step t of the replica r is the Philox-4x64-10 block of
+the counter (t, w, r, 0) under a key derived from the seed. The number
+depends only on these values, so it is the same whatever the order in
+which the walks are simulated, the number of replicas in a batch or
+the number of processes. All the numbers of a step are generated by a
+single call. The stream of a walk is the same as the stream of
+numpy.random.Generator(numpy.random.Philox(key=key, counter=(t-1, w,
+r, 0))).random().
+
+"""
+import numpy as np
+
+# Philox-4x64 multipliers and Weyl increments of the key.
+PHILOX_M0 = np.uint64(0xD2E7470EE14C6C93)
+PHILOX_M1 = np.uint64(0xCA5A826395121157)
+PHILOX_W0 = np.uint64(0x9E3779B97F4A7C15)
+PHILOX_W1 = np.uint64(0xBB67AE8584CAA73B)
+PHILOX_ROUNDS = 10
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+def mulhilo(mult: np.uint64, vals: np.ndarray) -> tuple:
+    """Return the high and the low 64 bits of the 128-bit products of the
+    multiplier by the values.
+
+    """
+    lo = mult * vals
+    mlo, mhi = mult & _MASK32, mult >> _SHIFT32
+    vlo, vhi = vals & _MASK32, vals >> _SHIFT32
+    lolo = mlo * vlo
+    lohi = mlo * vhi
+    hilo = mhi * vlo
+    mid = (lolo >> _SHIFT32) + (lohi & _MASK32) + (hilo & _MASK32)
+    hi = mhi * vhi + (lohi >> _SHIFT32) + (hilo >> _SHIFT32) + \
+        (mid >> _SHIFT32)
+    return hi, lo
+
+def philox(counter: list, key: np.ndarray) -> list:
+    """Return the four 64-bit words of the Philox-4x64-10 blocks of the
+    counters under the key.
+
+    counter (list): the four words of the counters, arrays that
+                    broadcast to the same shape
+    key (np.ndarray): the two words of the key
+
+    """
+    ctr = np.broadcast_arrays(*[np.asarray(c, dtype=np.uint64)
+                                for c in counter])
+    k0, k1 = np.uint64(key[0]), np.uint64(key[1])
+    with np.errstate(over='ignore'):
+        for i in range(PHILOX_ROUNDS):
+            if i > 0:
+                k0, k1 = k0 + PHILOX_W0, k1 + PHILOX_W1
+            hi0, lo0 = mulhilo(PHILOX_M0, ctr[0])
+            hi1, lo1 = mulhilo(PHILOX_M1, ctr[2])
+            ctr = [hi1 ^ ctr[1] ^ k0, lo1, hi0 ^ ctr[3] ^ k1, lo0]
+    return ctr
+
+def to_double(word: np.ndarray) -> np.ndarray:
+    """Convert 64-bit words to doubles uniform in [0, 1) the same way
+    numpy.random.Generator.random does.
+
+    """
+    return (word >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+class Streams():
+    """Counter-based streams of uniform numbers, one per walk.
+
+    """
+    def __init__(self, seed=None, replica=0):
+        """seed (int): seed of the streams, taken from the system if None
+        replica (int): replica whose streams are generated
+
+        """
+        seq = np.random.SeedSequence(seed)
+        # The entropy reproduces the streams when no seed is given.
+        self.entropy = seq.entropy
+        self.key = seq.generate_state(2, np.uint64)
+        self.replica = replica
+
+    def uniforms(self, step: int, nwalks: int, replicas=None,
+                 purpose=0, first=0) -> np.ndarray:
+        """Return the uniform number of each walk at the step, one per walk
+        or a replicas x walks array if the replicas are given.
+
+        step (int): step of the simulation
+        nwalks (int): number of walks
+        replicas (np.ndarray): replicas whose numbers are generated,
+                               the replica of the streams if None
+        purpose (int): distinguishes different numbers drawn by the
+                       same walk at the same step
+        first (int): first walk of the nwalks walks whose numbers are
+                     generated
+
+        """
+        wids = np.arange(first, first+nwalks, dtype=np.uint64)
+        if replicas is None:
+            reps = np.uint64(self.replica)
+        else:
+            reps = np.asarray(replicas, dtype=np.uint64)[:, None]
+        words = philox([np.uint64(step), wids, reps, np.uint64(purpose)],
+                       self.key)
+        return to_double(words[0])
+
+def sample(weights: np.ndarray, uniforms: np.ndarray) -> np.ndarray:
+    """Choose one index of the last axis of the weights by inverse
+    transform sampling and return the chosen indices.
+
+    weights (np.ndarray): non-negative weights, not normalized
+    uniforms (np.ndarray): uniform numbers in [0, 1), one per choice
+
+    """
+    cum = np.cumsum(weights, axis=-1)
+    target = uniforms * cum[..., -1]
+    idx = np.count_nonzero(cum <= target[..., None], axis=-1)
+    # The rounding may take the target to the end of the cumulative
+    # sum, the last index with positive weight is taken then.
+    last = weights.shape[-1] - 1 - \
+        np.argmax(weights[..., ::-1] > 0, axis=-1)
+    return np.minimum(idx, last)
+
+def sample_cells(weights: np.ndarray, groups: list,
+                 uniforms: np.ndarray) -> np.ndarray:
+    """Choose one cell of each row of weights in CSR form and return the
+    chosen cells. The rows of the same size are sampled at once as the
+    rows of a matrix, so each row is sampled as by sample().
+
+    weights (np.ndarray): non-negative weights of the cells, not
+                          normalized, the cells are on the last axis
+    groups (list): pairs of rows and the rows x size array of their
+                   cells, from Territory.groups
+    uniforms (np.ndarray): uniform numbers in [0, 1), one per row
+
+    """
+    chosen = np.zeros(uniforms.shape, dtype=np.int64)
+    for rows, cells in groups:
+        idx = sample(weights[..., cells], uniforms[..., rows])
+        chosen[..., rows] = cells[np.arange(len(rows)), idx]
+    return chosen
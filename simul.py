@@ -7,90 +7,236 @@ simulation as defined in
 import numpy as np
 
 from data import Data
+from fenwick import FenwickForest
 from graph import Graph
-from log import write as logwrite
+import log
+import metrics
 from prob import Probability
-from walk import Walk
+from rng import Streams, sample_cells
+from sink import MemorySink
+from territory import Territory
+from walk import Walks
 
-def has_loc(vert: int, walks: list[Walk]) -> list[Walk]:
-    """Return a list of walks whose vertex vert is a possible location to
-    go.
+# Version of the simulation engine, it changes when the same parameters
+# and seed give a different result.
+VERSION = 1
 
-    """
-    mates =[]
-    for walk in walks:
-        if vert in walk.vertices():
-            if walk not in mates:
-                mates.append(walk)
+def _stop(data: Data, step: int, reason: str):
+    """Note in the output and in the log the step where the simulation
+    stopped and why.
 
-    assert len(mates) > 0
-    return mates
+    """
+    log.info('stop_step={}\nstop_reason={}', step, reason)
+    data.note('stop_step', step)
+    data.note('stop_reason', reason)
 
 def simulate(nsteps: int, graph: Graph,
-             walks: list[Walk], prob: Probability,
-             seed=None):
-    """Start the walking stopping after a number of steps.
+             walks: Walks, prob: Probability,
+             seed=None, check=False, territory=None, data=None,
+             replica=0, start=0, checkpoint=None, stop=None,
+             profile=None):
+    """Start the walking stopping after a number of steps or when the
+    stopping rule is met.
 
     nsteps (int):    the number of steps to walk
     alpha (float):   reinforcing factor
     func (function): function to apply in the transition
                      probability calculation
-    seed (float):    seed value for the pseudo-number generator,
-                     must be between 0.0 and 1.0
+    seed (int):      seed value for the pseudo-number generator,
+                     taken from the system if None
+    check (bool):    verify the cached visit totals at each step
+    territory (Territory): index of the walks allowed in each vertex,
+                     it is built from the walks if not given
+    data (Data):     output of the visits, kept in memory if not
+                     given
+    replica (int):   replica of the streams of pseudo-random numbers
+    start (int):     last step simulated by a resumed run, the walks
+                     must have its state and seed its entropy
+    checkpoint (Checkpoint): saves the walks periodically if given
+    stop (Convergence): stopping rule checked after each step, the step
+                     and the reason of the stop are noted in the output
+    profile (Profile): measures the time of each phase of the steps
     """
+    if territory is None:
+        territory = Territory(walks)
+
     # Write walks info to log file
-    for count, walk in enumerate(walks):
-        logwrite('loc(w{}, t=0)=v{}'.format(count, walk.cur_location()))
-        logwrite('G(w{})={}'.format(count, walk.vertices()))
+    if log.enabled(log.DEBUG):
+        for count, walk in enumerate(walks):
+            log.debug('loc(w{}, t=0)=v{}', count, walk.cur_location())
+            log.debug('G(w{})={}', count, walk.vertices())
 
-    # Seed pseudo-random number generator
-    np.random.seed(seed)
+    # Vertex of each cell of the probabilities and the walks grouped
+    # by the size of their territories to sample them.
+    cells = territory.cells()
+    groups = territory.groups()
+    # One stream of pseudo-random numbers per walk.
+    streams = Streams(seed, replica)
+    log.info('entropy={}', streams.entropy)
 
-    data = Data(walks)
-    for i in range(1, nsteps+1):
-        logwrite('t={}'.format(i))
-        # Save the next vertex destination for the walks
+    if data is None:
+        data = Data(walks, sink=MemorySink())
+    if checkpoint is not None:
+        checkpoint.start(walks, data, stop)
+    if stop is not None:
+        stop.start(walks)
+    if profile is None:
+        profile = metrics.NullProfile()
+    profile.start(start)
+    for i in range(start+1, nsteps+1):
+        log.debug('t={}', i)
+
+        # Transition probabilities of all walks at once.
+        probs = prob.transitions(walks, graph, territory)
+        profile.mark('transitions')
+        # Choose the next vertex destination of all walks
         # to update the number of visits at once.
-        locs = {}
+        rands = streams.uniforms(i, len(walks))
+        pos = sample_cells(probs, groups, rands)
+        profile.mark('sample')
 
-        for count, walk in enumerate(walks):
-            # Initialize the array of probability transitions
-            # of w goto v with zeros.
-            probs = np.zeros(graph.order())
-
-            v_src = walk.cur_location()
-            logwrite('  loc(w{})=v{}'.format(count, v_src))
-            for v_dest in list(graph.neighbors(v_src)):
-                # Select the walks that has the destination vertex as
-                # a possible location to walk.
-                walks_v_dest = has_loc(v_dest, walks)
-
-                probs[v_dest] = prob.calculate(walks_v_dest, walk, v_dest)
-                logwrite('\t  => Pr(w{}, v{})={:.2f}'
-                         .format(count, v_dest, probs[v_dest]))
-
-            # Sum the transition probabilies
-            probs_sum = np.sum(probs)
-            # Log the normalized probabilities
-            for v_dest in graph.neighbors(v_src):
-                probs[v_dest] /= probs_sum
-                logwrite('\t-> Pr(w{}, v{})={:.2f}'
-                         .format(count, v_dest, probs[v_dest]))
-            # Generate a random number between 0.0 and probs_sum
-            rand = np.random.uniform(0.0, 1.0)
-            # Choose the next vertex destination
-            prob_acc = 0.0
-            for v_dest in graph.neighbors(v_src):
-                prob_acc += probs[v_dest]
-                if prob_acc > rand:
-                    locs[walk] = v_dest
-                    # Log next step
-                    logwrite('  -> rand={:.2f}/1.0, w{} goto v{}\n'
-                             .format(rand, count, v_dest))
-                    break
+        if log.enabled(log.DEBUG):
+            for count, walk in enumerate(walks):
+                v_src = walk.cur_location()
+                log.debug('  loc(w{})=v{}', count, v_src)
+                # Log the normalized probabilities
+                if log.enabled(log.TRACE):
+                    row = walks.row(count)
+                    for v_dest, pr in zip(cells[row], probs[row]):
+                        if pr > 0:
+                            log.trace('\t-> Pr(w{}, v{})={:.2f}',
+                                      count, v_dest, pr)
+                # Log next step
+                log.debug('  -> rand={:.2f}/1.0, w{} goto v{}\n',
+                          rands[count], count, cells[pos[count]])
+            profile.mark('log')
         # Update visits
+        walks.visit_all(pos)
+        profile.mark('visit')
+        if check:
+            walks.check()
+            profile.mark('check')
+
+        data.write()
+        profile.mark('write')
+        profile.step(i)
+        if stop is not None:
+            done = stop.update(i)
+            profile.mark('stop')
+            if done:
+                _stop(data, i, stop.reason)
+                break
+        # The checkpoint has the sample of the stopping rule taken at
+        # the step.
+        if checkpoint is not None:
+            checkpoint.update(i, streams.entropy)
+            profile.mark('checkpoint')
+
+    data.close()
+    profile.mark('close')
+    profile.finish()
+
+def simulate_async(nsteps: int, graph: Graph,
+                   walks: Walks, prob: Probability,
+                   seed=None, check=False, territory=None, data=None,
+                   replica=0, start=0, checkpoint=None, stop=None,
+                   profile=None):
+    """Start the asynchronous walking, where a single walk chosen at
+    random moves at each tick, stopping after a number of steps. A step
+    has as many ticks as walks. The weights of each walk over its
+    territory are kept in a Fenwick tree, so a move and the update of
+    the walks affected by a visit take logarithmic time in the size of
+    the territories. The territories must be complete subgraphs.
+
+    The arguments are the same of simulate.
+    """
+    if territory is None:
+        territory = Territory(walks)
+    nwalks = len(walks)
+    # The leaves of the tree of a walk are the cells of its territory.
+    cells = territory.cells()
+    if not graph.is_complete():
         for walk in walks:
-            v_next_dest = locs[walk]
-            walk.visit(v_next_dest)
+            verts = walk.vertices()
+            if not graph.adjacent(verts[:, None], verts).all():
+                raise ValueError('the territory of w{} is not a complete '
+                                 'subgraph, required by the asynchronous '
+                                 'dynamics'.format(walk.index))
+    nwalks_vert = territory.nwalks()
+    forest = FenwickForest(prob.cell_weights(walks.counts,
+                                             walks.vertex_totals[cells],
+                                             nwalks_vert[cells]),
+                           territory.indptr())
+    # The trees are rebuilt after about as many updates as leaves in the
+    # largest tree, so the rebuilding does not dominate the time of the
+    # ticks.
+    rebuild = max(1, int(np.diff(territory.indptr()).max(initial=0)) //
+                  nwalks)
+
+    streams = Streams(seed, replica)
+    log.info('entropy={}', streams.entropy)
+
+    if data is None:
+        data = Data(walks, sink=MemorySink())
+    if checkpoint is not None:
+        checkpoint.start(walks, data, stop)
+    if stop is not None:
+        stop.start(walks)
+    if profile is None:
+        profile = metrics.NullProfile()
+    profile.start(start)
+    for i in range(start+1, nsteps+1):
+        log.debug('t={}', i)
+        # The walk that moves and its destination at each tick.
+        movers = np.minimum((streams.uniforms(i, nwalks, purpose=1) *
+                             nwalks).astype(np.int64), nwalks-1)
+        rands = streams.uniforms(i, nwalks, purpose=2)
+        profile.mark('uniforms')
+        for tick in range(nwalks):
+            wid = int(movers[tick])
+            try:
+                leaf = forest.sample(wid, rands[tick])
+            except ValueError:
+                raise ValueError('the transition weights of w{} must be '
+                                 'finite and positive'.format(wid)) \
+                    from None
+            vert = int(cells[leaf])
+            log.debug('  w{} goto v{}', wid, vert)
+            walks.visit(wid, vert, leaf)
+            # The visit changes the weight of the vertex for all
+            # walks allowed in it.
+            leaves = territory.positions(vert)
+            forest.update(leaves,
+                          prob.cell_weights(walks.counts[leaves],
+                                            walks.vertex_totals[vert],
+                                            nwalks_vert[vert]))
+        profile.mark('ticks')
+        # Remove the rounding accumulated by the updates.
+        if i % rebuild == 0:
+            forest.rebuild()
+            profile.mark('rebuild')
+        if check:
+            walks.check()
+            profile.mark('check')
 
         data.write()
+        profile.mark('write')
+        profile.step(i)
+        if stop is not None:
+            done = stop.update(i)
+            profile.mark('stop')
+            if done:
+                _stop(data, i, stop.reason)
+                break
+        # The trees of a resumed run are built from the weights, the
+        # same is done after a checkpoint to go on as the resumed run.
+        # The checkpoint has the sample of the stopping rule taken at
+        # the step.
+        if checkpoint is not None:
+            if checkpoint.update(i, streams.entropy):
+                forest.rebuild()
+            profile.mark('checkpoint')
+
+    data.close()
+    profile.mark('close')
+    profile.finish()
@@ -0,0 +1,334 @@
+"""Simulation API to run the walks from Python.
+
+A Simulation builds the graph, the walks and the transition probability
+from its parameters, the same parameters of the configuration file, and
+runs them with the rows kept in memory by default. Nothing is written
+to files or to the standard output unless a sink writing them is given,
+and the log is written only if it was configured.
+
+    sim = Simulation('partitions', vertices=10, partition_size=3,
+                     nsteps=1000, seed=1)
+    walks = sim.run()
+    occ = sim.output.occupation()
+
+"""
+import configparser
+import os
+
+import numpy as np
+
+import checkpoint
+import edgelist
+import ensemble
+import log
+from batch import simulate_batch
+from converge import Convergence
+from graph import Graph
+from parallel import simulate_parallel
+from prob import FUNCTIONS, Probability
+from simul import simulate, simulate_async
+from sink import MemorySink, Sink
+from data import Data
+from territory import Territory
+from walk import Walks
+
+TYPES = ('complete', 'partitions', 'file')
+DYNAMICS = ('sync', 'async')
+
+def topology_key(gtype: str, vertices=None, partition_size=0, graph=None,
+                 labels=None) -> tuple:
+    """Return the key that identifies the graph and the initial walks, the
+    files are identified by their path, size and modification time.
+
+    """
+    files = []
+    for fname in (graph, labels):
+        if gtype == 'file' and fname is not None:
+            stat = os.stat(fname)
+            files.append((os.path.abspath(fname), stat.st_size,
+                          stat.st_mtime_ns))
+        else:
+            files.append(None)
+    return (gtype, vertices, partition_size if gtype == 'partitions'
+            else 0, *files)
+
+def topology(gtype: str, vertices=None, partition_size=0, graph=None,
+             labels=None) -> tuple[Graph, Walks]:
+    """Return the graph and the initial walks of the graph type, the
+    arguments are the same of Simulation.
+
+    """
+    if gtype == 'complete':
+        gph = Graph(vertices)
+        walks = Walks(vertices, vertices)
+        verts = gph.neighbors(0)
+        for i in gph.vertices():
+            # The walk can traverse all vertices.
+            walks.add(verts, i)
+    elif gtype == 'partitions':
+        if partition_size > vertices:
+            raise ValueError('number of partitions > number of vertices')
+        gph = Graph(vertices, complete=False, partition_size=partition_size)
+        walks = Walks(vertices, vertices)
+        # Connect each vertex to the vertices of its partition.
+        gph.connect_partitions()
+        for i in gph.vertices():
+            # Each walk starts at the vertex with the same id and walks
+            # in the partition that starts there. For example, a walk
+            # with id 2 starts at v2, and if the partition size is 2, it
+            # can walk at v2 and v3. All subgraphs are complete.
+            walks.add(gph.partition(i), i)
+    else:
+        if graph is None:
+            raise ValueError('the edge-list graph file was not set')
+        gph = edgelist.load(graph, vertices)
+        nverts = gph.order()
+        if labels is not None:
+            # The walk of each label starts at its first vertex.
+            terrs = edgelist.read_labels(labels, nverts)
+            starts = [terr[0] for terr in terrs]
+        else:
+            # Each walk starts at the vertex with the same id and can
+            # walk in its neighborhood.
+            terrs = [gph.neighbors(i) for i in gph.vertices()]
+            starts = gph.vertices()
+        walks = Walks(len(terrs), nverts)
+        for terr, start in zip(terrs, starts):
+            walks.add(terr, start)
+    return gph, walks
+
+class Simulation():
+    """Graph, walks and transition probability of a simulation.
+
+    """
+    def __init__(self, gtype='complete', vertices=None, nsteps=100,
+                 function=None, alpha=1.0, epsilon=0.0, partition_size=0,
+                 graph=None, labels=None, seed=None, dynamics='sync',
+                 check=False, params=None, cache=None):
+        """Build the simulation, ValueError is raised if the parameters
+        are not valid.
+
+        gtype (str): "complete", "partitions" or "file"
+        vertices (int): number of vertices, taken from the edges of the
+                        graph file if None
+        nsteps (int): number of steps to walk
+        function (str): name of a function in prob.FUNCTIONS, the walks
+                        in partitions always use POW, the default is
+                        EXP in the complete graph and POW in a graph
+                        file
+        alpha (float): reinforcing factor
+        epsilon (float): Pigeard/Rosales factor
+        partition_size (int): number of vertices in each partition
+        graph (str): edge-list file of the graph file
+        labels (str): label file with the territories in the graph file
+        seed (int): seed of the pseudo-random numbers, taken from the
+                    system if None
+        dynamics (str): "sync" or "async"
+        check (bool): verify the cached visit totals at each step
+        params (dict): values of the other parameters of the function
+        cache (dict): graphs, initial walks and territories built by
+                      other simulations, reused when the topology is
+                      the same and updated when it is new
+
+        """
+        if gtype not in TYPES:
+            raise ValueError('unknown graph type "{}"'.format(gtype))
+        if dynamics not in DYNAMICS:
+            raise ValueError('unknown dynamics "{}"'.format(dynamics))
+        if gtype != 'file' and vertices is None:
+            raise ValueError('the number of vertices was not set')
+        self.gtype = gtype
+        self.nsteps = nsteps
+        self.seed = seed
+        self.dynamics = dynamics
+        self.check = check
+        # Output of the last run kept in memory.
+        self.output = None
+
+        if gtype == 'complete':
+            self.prob = Probability(function or 'EXP')
+        elif gtype == 'partitions':
+            # For partitions the function is always POWER.
+            self.prob = Probability('POW')
+        else:
+            self.prob = Probability(function or 'POW')
+        key = topology_key(gtype, vertices, partition_size, graph, labels)
+        if cache is not None and key in cache:
+            self.graph, self.walks, self.territory = cache[key]
+        else:
+            self.graph, self.walks = topology(gtype, vertices,
+                                              partition_size, graph, labels)
+            # The territories do not change during the simulation.
+            self.territory = Territory(self.walks)
+            if cache is not None:
+                cache[key] = (self.graph, self.walks, self.territory)
+        self.prob.set_params(alpha=alpha, epsilon=epsilon, **(params or {}))
+
+    def __simulate(self, walks: Walks, sink: Sink, stride: int, seed,
+                   replica=0, start=0, stop=None, profile=None,
+                   ckpt=None, nworkers=1) -> Walks:
+        """Run the walks from the step start and return them.
+
+        """
+        if self.dynamics == 'async' and nworkers != 1:
+            raise ValueError('the async dynamics runs in a single process')
+        self.output = sink if sink is not None else MemorySink()
+        data = Data(walks, stride=stride, sink=self.output, start=start)
+        opts = {}
+        if self.dynamics == 'async':
+            run = simulate_async
+        elif nworkers != 1:
+            run = simulate_parallel
+            opts['nworkers'] = nworkers
+        else:
+            run = simulate
+        run(self.nsteps, self.graph, walks, self.prob, seed, self.check,
+            self.territory, data, replica=replica, start=start,
+            checkpoint=ckpt, stop=stop, profile=profile, **opts)
+        return walks
+
+    def run(self, sink=None, stride=1, replica=0, stop=None, profile=None,
+            ckpt=None, nworkers=1) -> Walks:
+        """Run a replica from the initial state and return the walks at
+        the end.
+
+        sink (Sink): where the rows are written, kept in memory in
+                     output if not given
+        stride (int): write only every stride-th step
+        replica (int): replica of the streams of pseudo-random numbers
+        stop (Convergence): stopping rule (optional)
+        profile (Profile): measures the time of the phases (optional)
+        ckpt (Checkpoint): saves the walks periodically (optional)
+        nworkers (int): number of processes that share the walks, 1
+                        runs them in this process and 0 uses all CPUs
+
+        """
+        return self.__simulate(self.walks.copy(), sink, stride, self.seed,
+                               replica, stop=stop, profile=profile,
+                               ckpt=ckpt, nworkers=nworkers)
+
+    def resume(self, fname=checkpoint.FNAME, sink=None, stride=1,
+               stop=None, profile=None, ckpt=None, nworkers=1) -> Walks:
+        """Continue the run saved in the checkpoint and return the walks at
+        the end. The arguments are the same of run.
+
+        fname (str): name of the checkpoint file
+
+        """
+        walks = self.walks.copy()
+        start, entropy = checkpoint.load(fname, walks, stride, stop)
+        log.info('resume={}', start)
+        return self.__simulate(walks, sink, stride, entropy, start=start,
+                               stop=stop, profile=profile, ckpt=ckpt,
+                               nworkers=nworkers)
+
+    def run_batch(self, nreplicas: int, sinks=None,
+                  stride=1) -> np.ndarray:
+        """Run the replicas at once in this process and return their number
+        of visits at the end as a replicas x cells array in the layout
+        of walks.cells.
+
+        sinks (list[Sink]): output of each replica (optional)
+
+        """
+        if self.dynamics != 'sync':
+            raise ValueError('the batch engine runs the sync dynamics')
+        return simulate_batch(nreplicas, self.nsteps, self.graph,
+                              self.walks, self.prob, self.seed,
+                              self.territory, sinks, stride)
+
+    def run_ensemble(self, nreplicas: int, nworkers=0, fmt='text',
+                     stride=1, loglevel='info', stop=None) -> list[str]:
+        """Run the replicas in a pool of processes, each writing its own
+        output file, and return the names of the files.
+
+        """
+        if self.dynamics != 'sync':
+            raise ValueError('the replicas run the sync dynamics')
+        return ensemble.run(nreplicas, nworkers, self.nsteps, self.graph,
+                            self.walks, self.prob, self.territory,
+                            self.seed, fmt, stride, loglevel, stop)
+
+def configure(params: configparser.SectionProxy, fname='rrwg.conf',
+              cache=None) -> Simulation:
+    """Return the simulation with the parameters of a section of the
+    configuration file, ValueError is raised if they are not valid.
+
+    params (SectionProxy): parameters of the simulation
+    fname (str): name of the configuration file shown in the errors
+    cache (dict): topologies shared by the simulations, see Simulation
+
+    """
+    if 'type' in params:
+        gtype = params['type']
+    else:
+        raise ValueError("""graph "type" is not defined in {}.
+    Graph "type" should be:
+    complete: complete graph with no partitions
+    partitions: non-complete graph with partitions
+    \t\tof complete subgraphs
+    file: graph read from the edge-list file set by "graph".""" \
+                         .format(fname))
+    log.info('type={}', gtype)
+
+    if gtype in ('complete', 'partitions') and 'vertices' not in params:
+        raise ValueError('number of "vertices" was not set in {}'
+                         .format(fname))
+    if gtype == 'partitions' and 'partition_size' not in params:
+        raise ValueError('"partition_size" was not set in {}.'
+                         .format(fname))
+    if gtype == 'file' and 'graph' not in params:
+        raise ValueError('the edge-list "graph" file was not set in {}.'
+                         .format(fname))
+    if 'time' not in params:
+        raise ValueError('"time" steps was not set in {}.'.format(fname))
+    # Parameters declared by the transition functions besides alpha and
+    # epsilon, validated by the function chosen.
+    names = {name for func in FUNCTIONS.values() for name in func.params
+             if name not in ('alpha', 'epsilon')}
+    sim = Simulation(
+        gtype,
+        # A graph file has as many vertices as its largest vertex plus
+        # one if they are not set.
+        vertices=params.getint('vertices'),
+        nsteps=params.getint('time'),
+        function=params.get('function'),
+        alpha=params.getfloat('alpha', fallback=1.0),
+        epsilon=params.getfloat('epsilon', fallback=0.0),
+        partition_size=params.getint('partition_size', fallback=0),
+        graph=params.get('graph'), labels=params.get('labels'),
+        seed=params.getint('seed'),
+        # All walks move at each step (sync) or a single walk chosen at
+        # random moves at each tick (async).
+        dynamics=params.get('dynamics', 'sync'),
+        # Verify the cached visit totals at each step (slow).
+        check=params.getboolean('check', fallback=False),
+        params={name: params.getfloat(name) for name in names
+                if name in params},
+        cache=cache)
+    log.info('vertices={}', sim.graph.order())
+    log.info('function={}\nalpha={}\nepsilon={}',
+             sim.prob.function_name(), sim.prob.alpha, sim.prob.epsilon)
+    for name, value in sorted(sim.prob.params().items()):
+        if name not in ('alpha', 'epsilon'):
+            log.info('{}={}', name, value)
+    if sim.seed is not None:
+        log.info('seed={}', sim.seed)
+    return sim
+
+def stopping(params: configparser.SectionProxy) -> Convergence:
+    """Return the stopping rule of a section of the configuration file,
+    None if the simulation runs all steps.
+
+    """
+    rule = params.get('stop', 'off')
+    if rule == 'off':
+        return None
+    stop = Convergence(
+        rule,
+        every=params.getint('stop_every', fallback=100),
+        window=params.getint('stop_window', fallback=10),
+        tol=params.getfloat('stop_tol', fallback=1e-3),
+        support=params.getfloat('stop_support', fallback=0.01))
+    log.info('stop={}', rule)
+    return stop
@@ -0,0 +1,492 @@
+"""Destinations of the simulation output.
+
+A sink receives the layout of the output once and then one row per step
+written, with the number of visits of each walk in each vertex of its
+territory. The rows are copies of the state of the walks, so they can be
+written by another thread while the simulation goes on.
+
+"""
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+
+import numpy as np
+
+from walk import COUNT_DTYPE
+
+FORMATS = ('text', 'binary')
+FNAMES = {'text': 'rrwg.dat', 'binary': 'rrwg.npy', 'summary': 'rrwg.npz'}
+# Size reserved to the .npy header, enough to update the number of rows.
+NPY_HEADER_SIZE = 128
+
+def header_fname(fname: str) -> str:
+    """Return the name of the JSON header of the binary output file.
+
+    """
+    return os.path.splitext(fname)[0] + '.json'
+
+def npy_header(shape: tuple) -> bytes:
+    """Return a .npy version 1.0 header with NPY_HEADER_SIZE bytes for an
+    array of counts with the specified shape.
+
+    """
+    magic = b'\x93NUMPY\x01\x00'
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': {}, }}" \
+        .format(np.dtype(COUNT_DTYPE).str, repr(tuple(shape)))
+    header = header.ljust(NPY_HEADER_SIZE - len(magic) - 3) + '\n'
+    return magic + struct.pack('<H', len(header)) + header.encode('latin1')
+
+def columns(header: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Return the walk and the vertex of each column of the output
+    described by the header.
+
+    """
+    terrs = header['territories']
+    walk_ids = np.repeat(np.arange(len(terrs)), [len(t) for t in terrs])
+    vertex_ids = np.fromiter((v for terr in terrs for v in terr),
+                             dtype=np.int64, count=len(walk_ids))
+    return walk_ids, vertex_ids
+
+def file_sink(fname=None, fmt='text') -> 'Sink':
+    """Return the sink that writes the output to a file in the format.
+
+    fname (str): name of the output file, the name in FNAMES of the
+                 format if not given
+    fmt (str): "text", "binary" or "summary"
+
+    """
+    if fmt == 'summary':
+        return SummarySink(fname)
+    return FileSink(fname, fmt)
+
+def normalize(counts: np.ndarray, walk_ids: np.ndarray) -> np.ndarray:
+    """Divide the number of visits in each column by the total number of
+    visits of the walk of the column. The columns of a walk must be
+    contiguous.
+
+    counts (np.ndarray): rows of visits, one column per walk and vertex
+    walk_ids (np.ndarray): walk of each column
+
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if counts.shape[-1] == 0:
+        return counts
+    bounds, group = np.unique(walk_ids, return_index=True,
+                              return_inverse=True)[1:]
+    totals = np.add.reduceat(counts, bounds, axis=-1)
+    return counts / totals[..., group]
+
+class Sink():
+    """Base class of the output sinks.
+
+    """
+    def open(self, header: dict):
+        """Receive the layout of the output: the number of walks and
+        vertices, the territory of each walk and the stride between the
+        steps written.
+
+        """
+        self.header = header
+        self.walk_ids, self.vertex_ids = columns(header)
+
+    def resume(self, header: dict, nrows: int):
+        """Receive the layout of an output whose first nrows rows were
+        written by a run that is resumed, the next rows are appended to
+        them.
+
+        """
+        Sink.open(self, header)
+
+    def write(self, step: int, row: np.ndarray):
+        """Write the number of visits of each column at the step.
+
+        """
+        raise NotImplementedError
+
+    def note(self, key: str, value):
+        """Add an entry to the metadata of the output, like the step where
+        the simulation stopped.
+
+        """
+        self.header[key] = value
+
+    def flush(self):
+        """Wait until the rows written are in the output.
+
+        """
+
+    def close(self):
+        """Finish the output.
+
+        """
+
+class StreamSink(Sink):
+    """Write the output to an open stream, in text the header line has
+    the label of the columns, in binary the header is a line of JSON.
+    The metadata noted is written as comment lines in text.
+
+    """
+    def __init__(self, stream=None, fmt='text'):
+        """stream (file): text stream for text, binary stream for binary,
+                          sys.stdout if not given
+        fmt (str): "text" or "binary"
+
+        """
+        if fmt not in FORMATS:
+            raise ValueError('unknown output format "{}"'.format(fmt))
+        if stream is None:
+            stream = sys.stdout if fmt == 'text' else sys.stdout.buffer
+        self._stream = stream
+        self._fmt = fmt
+        self.nrows = 0
+
+    def open(self, header: dict):
+        super().open(header)
+        self._start(0)
+        self._write_header()
+
+    def resume(self, header: dict, nrows: int):
+        super().resume(header, nrows)
+        self._start(nrows)
+
+    def _start(self, nrows: int):
+        """Prepare the rows after the first nrows rows.
+
+        """
+        # Columns where each walk starts and walk of each column.
+        self._bounds, self._group = np.unique(self.walk_ids,
+                                              return_index=True,
+                                              return_inverse=True)[1:]
+        self.nrows = nrows
+
+    def _write_header(self):
+        """Write the header before the first row.
+
+        """
+        if self._fmt == 'text':
+            self._stream.write(''.join(['\tw{}v{}'.format(i, j)
+                                        for i, j in zip(self.walk_ids,
+                                                        self.vertex_ids)]))
+            self._stream.write('\n')
+        else:
+            self._stream.write(json.dumps(self.header).encode() + b'\n')
+
+    def write(self, step: int, row: np.ndarray):
+        self.nrows += 1
+        if self._fmt == 'binary':
+            self._stream.write(row.tobytes())
+            return
+        vis = row / np.add.reduceat(row, self._bounds)[self._group] \
+            if len(row) else row
+        self._stream.write(''.join(['\t{:.3f}'.format(x) for x in vis]))
+        self._stream.write('\n')
+
+    def note(self, key: str, value):
+        super().note(key, value)
+        # The comment lines are skipped by read.table in R.
+        if self._fmt == 'text':
+            self._stream.write('# {}={}\n'.format(key, value))
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self._stream.flush()
+
+class FileSink(StreamSink):
+    """Write the output to a file. The binary file is a .npy file of
+    counts and its layout and metadata are described by a JSON header
+    with the same name. The file is created when the layout of the output
+    is received.
+
+    """
+    def __init__(self, fname=None, fmt='text'):
+        """fname (str): name of the output file, rrwg.dat for text and
+                        rrwg.npy for binary if not given
+        fmt (str): "text" or "binary"
+
+        """
+        if fmt not in FORMATS:
+            raise ValueError('unknown output format "{}"'.format(fmt))
+        self.fname = fname or FNAMES[fmt]
+        self._stream = None
+        self._fmt = fmt
+        self.nrows = 0
+
+    def open(self, header: dict):
+        self._stream = open(self.fname, 'w' if self._fmt == 'text' else 'wb')
+        super().open(header)
+
+    def resume(self, header: dict, nrows: int):
+        super().resume(header, nrows)
+        if self._fmt == 'binary':
+            size = NPY_HEADER_SIZE + nrows * len(self.walk_ids) * \
+                np.dtype(COUNT_DTYPE).itemsize
+            if os.path.getsize(self.fname) < size:
+                raise ValueError('{} has less than the {} rows of the '
+                                 'resumed run'.format(self.fname, nrows))
+        else:
+            # The rows of the text output do not have the same size,
+            # the header line and the rows kept are skipped.
+            with open(self.fname, 'rb') as datf:
+                for _ in range(nrows+1):
+                    if not datf.readline().endswith(b'\n'):
+                        raise ValueError('{} has less than the {} rows of '
+                                         'the resumed run'
+                                         .format(self.fname, nrows))
+                size = datf.tell()
+        os.truncate(self.fname, size)
+        if self._fmt == 'text':
+            self._stream = open(self.fname, 'a')
+        else:
+            # Not in append mode, the .npy header is updated on close.
+            self._stream = open(self.fname, 'r+b')
+            self._stream.seek(0, os.SEEK_END)
+
+    def _write_header(self):
+        if self._fmt == 'text':
+            super()._write_header()
+            return
+        self._stream.write(npy_header((0, len(self.walk_ids))))
+        self.__write_json()
+
+    def __write_json(self):
+        """Write the JSON header describing the binary output.
+
+        """
+        header = dict(self.header, dtype=np.dtype(COUNT_DTYPE).str,
+                      rows=self.nrows)
+        with open(header_fname(self.fname), 'w') as hdrf:
+            json.dump(header, hdrf)
+
+    def flush(self):
+        self._stream.flush()
+        os.fsync(self._stream.fileno())
+
+    def close(self):
+        if self._stream is None or self._stream.closed:
+            return
+        if self._fmt == 'binary':
+            self._stream.seek(0)
+            self._stream.write(npy_header((self.nrows, len(self.walk_ids))))
+            self.__write_json()
+        self._stream.close()
+
+class MemorySink(Sink):
+    """Keep the output in memory.
+
+    """
+    def __init__(self):
+        self.steps = []
+        self.rows = []
+
+    def write(self, step: int, row: np.ndarray):
+        self.steps.append(step)
+        self.rows.append(row)
+
+    def array(self) -> np.ndarray:
+        """Return the rows written as a steps x columns array of counts.
+
+        """
+        if not self.rows:
+            return np.zeros((0, len(self.walk_ids)), dtype=COUNT_DTYPE)
+        return np.stack(self.rows)
+
+    def occupation(self) -> np.ndarray:
+        """Return the rows written normalized by the total number of visits
+        of each walk.
+
+        """
+        return normalize(self.array(), self.walk_ids)
+
+class ThreadedSink(Sink):
+    """Hand the rows to another sink in a writer thread. The rows wait in
+    a bounded queue, when it is full the simulation waits for the writer.
+
+    """
+    def __init__(self, sink: Sink, maxsize=16):
+        """sink (Sink): sink that writes the rows
+        maxsize (int): maximum number of rows waiting to be written
+
+        """
+        self._sink = sink
+        self._queue = queue.Queue(maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self.__run, daemon=True)
+        self._thread.start()
+
+    def __run(self):
+        """Write the rows in the queue until None is received.
+
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is None:
+                try:
+                    self._sink.write(*item)
+                except Exception as err: # pylint: disable=broad-except
+                    self._error = err
+            self._queue.task_done()
+
+    def __raise(self):
+        """Raise in the simulation the error found by the writer.
+
+        """
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise err
+
+    def open(self, header: dict):
+        super().open(header)
+        self._sink.open(header)
+
+    def resume(self, header: dict, nrows: int):
+        super().resume(header, nrows)
+        self._sink.resume(header, nrows)
+
+    def write(self, step: int, row: np.ndarray):
+        self.__raise()
+        self._queue.put((step, row))
+
+    def note(self, key: str, value):
+        # The entry goes after the rows already written.
+        self.flush()
+        super().note(key, value)
+        self._sink.note(key, value)
+
+    def flush(self):
+        self._queue.join()
+        self.__raise()
+        self._sink.flush()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._sink.close()
+        self.__raise()
+
+class SummarySink(Sink):
+    """Keep statistics of the rows instead of the rows and write them as
+    a single .npz record when the output is finished. The memory used
+    and the size of the record do not depend on the number of steps.
+
+    The record has, for each column, the occupation at the last row
+    (occupation), its mean (mean) and variance (var) over the rows, and
+    the first step with a visit of the walk to the vertex (hitting, -1
+    if not visited). For each walk it has the first step when all the
+    vertices of its territory were visited (cover, -1 if not covered),
+    and for each pair of walks with a vertex in the support of both at
+    the last row, the two walks and the number of such vertices
+    (joint_support), the support being the vertices with occupation
+    above a threshold. The layout of the output is a JSON string
+    (header).
+
+    """
+    def __init__(self, fname=None, support=0.01):
+        """fname (str): name of the record, rrwg.npz if not given
+        support (float): smallest occupation of a vertex in the support
+                         of a walk
+
+        """
+        self.fname = fname or FNAMES['summary']
+        self.support = support
+        # The record is written only once.
+        self._closed = False
+
+    def open(self, header: dict):
+        super().open(header)
+        ncols = len(self.walk_ids)
+        self._bounds, self._group = np.unique(self.walk_ids,
+                                              return_index=True,
+                                              return_inverse=True)[1:]
+        self.nrows = 0
+        self.last_step = 0
+        # Welford accumulators of the occupation.
+        self.mean = np.zeros(ncols)
+        self._m2 = np.zeros(ncols)
+        self.occupation = np.zeros(ncols)
+        self.hitting = np.full(ncols, -1, dtype=np.int64)
+        self._first = None
+
+    def resume(self, header: dict, nrows: int):
+        raise ValueError('the summary output cannot be resumed')
+
+    def write(self, step: int, row: np.ndarray):
+        if self._first is None:
+            self._first = row
+        occ = row / np.add.reduceat(row, self._bounds)[self._group] \
+            if len(row) else np.zeros(0)
+        self.nrows += 1
+        delta = occ - self.mean
+        self.mean += delta / self.nrows
+        self._m2 += delta * (occ - self.mean)
+        self.occupation = occ
+        self.last_step = step
+        self.hitting[(self.hitting < 0) & (row > self._first)] = step
+
+    def var(self) -> np.ndarray:
+        """Return the variance of the occupation of each column over the
+        rows.
+
+        """
+        return self._m2 / self.nrows if self.nrows else self._m2
+
+    def cover(self) -> np.ndarray:
+        """Return the cover time of each walk, -1 if it did not visit all
+        vertices of its territory.
+
+        """
+        nwalks = len(self.header['territories'])
+        if len(self.hitting) == 0:
+            return np.zeros(nwalks, dtype=np.int64)
+        cover = np.maximum.reduceat(self.hitting, self._bounds)
+        missed = np.minimum.reduceat(self.hitting, self._bounds) < 0
+        cover[missed] = -1
+        # Walks without territory have no columns.
+        result = np.zeros(nwalks, dtype=np.int64)
+        result[self.walk_ids[self._bounds]] = cover
+        return result
+
+    def joint_support(self) -> np.ndarray:
+        """Return the pairs of walks with vertices in the support of both,
+        one row per pair with the first walk, the second walk, not
+        smaller than the first, and the number of vertices. The pair of a
+        walk with itself has the size of its support. Only the cells in
+        the supports are visited, so the time grows with the square of
+        the number of walks that share each vertex.
+
+        """
+        inside = self.occupation > self.support
+        # Cells in the supports sorted by vertex and then by walk.
+        order = np.lexsort((self.walk_ids[inside], self.vertex_ids[inside]))
+        wids = self.walk_ids[inside][order].astype(np.int64)
+        verts = self.vertex_ids[inside][order]
+        # Each cell pairs with itself and the next cells of its vertex.
+        npairs = np.searchsorted(verts, verts, side='right') - \
+            np.arange(len(verts))
+        first = np.repeat(np.arange(len(verts)), npairs)
+        second = first + np.arange(len(first)) - \
+            np.repeat(np.cumsum(npairs) - npairs, npairs)
+        nwalks = len(self.header['territories'])
+        keys, counts = np.unique(wids[first] * nwalks + wids[second],
+                                 return_counts=True)
+        return np.stack([keys // nwalks, keys % nwalks, counts], axis=1)
+
+    def close(self):
+        if self._closed:
+            return
+        header = dict(self.header, rows=self.nrows, last_step=self.last_step,
+                      support=self.support)
+        with open(self.fname, 'wb') as sumf:
+            np.savez(sumf, header=json.dumps(header),
+                     occupation=self.occupation, mean=self.mean,
+                     var=self.var(), hitting=self.hitting,
+                     cover=self.cover(),
+                     joint_support=self.joint_support())
+        self._closed = True
@@ -0,0 +1,153 @@
+"""Sweeps of the parameters of the simulation over a grid.
+
+The section [sweep] of the configuration file has the values of the
+swept parameters separated by commas, the grid is every combination of
+them over the parameters in [default]. Each point of the grid is run by
+the program in its own process and directory, named by a hash of the
+normalized parameters, the seed included, and of the version of the
+simulation engine. A point whose directory has the parameters file was
+finished and is skipped, so a sweep run again computes only the points
+that are missing.
+
+"""
+import configparser
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from simul import VERSION
+
+DIRNAME = 'rrwg-sweep'
+# Parameters of the points, written when the point is finished.
+PARAMS_FNAME = 'params.json'
+# Points of the sweep and their directories.
+INDEX_FNAME = 'rrwg-sweep.json'
+# Parameters that do not change the result of a point.
+IGNORED = ('log', 'sink', 'queue', 'workers', 'profile', 'progress',
+           'checkpoint', 'checkpoint_time')
+# Values of the optional parameters when they are not set.
+DEFAULTS = {'alpha': '1', 'epsilon': '0', 'stride': '1', 'output': 'text',
+            'dynamics': 'sync', 'engine': 'process', 'replicas': '1',
+            'check': 'no', 'stop': 'off'}
+# Parameters with names of files, their size and time are in the hash.
+FILES = ('graph', 'labels')
+
+def grid(config: configparser.ConfigParser) -> list[dict]:
+    """Return the parameters of each point of the sweep.
+
+    """
+    base = dict(config['default'])
+    axes = [(key, [val.strip() for val in values.split(',')])
+            for key, values in config['sweep'].items()]
+    keys = [key for key, _ in axes]
+    return [dict(base, **dict(zip(keys, vals)))
+            for vals in itertools.product(*[vals for _, vals in axes])]
+
+def normalize(params: dict) -> dict:
+    """Return the parameters that change the result of the point with
+    their values in a single form, like 1 for 1.0 and True for yes.
+
+    """
+    norm = {}
+    for key, value in dict(DEFAULTS, **params).items():
+        if key in IGNORED:
+            continue
+        value = value.strip()
+        if value.lower() in configparser.ConfigParser.BOOLEAN_STATES \
+           and not value.isdigit():
+            norm[key] = configparser.ConfigParser.BOOLEAN_STATES[
+                value.lower()]
+            continue
+        try:
+            num = float(value)
+            norm[key] = int(num) if num.is_integer() else num
+        except ValueError:
+            norm[key] = value
+    for key in FILES:
+        if key in norm:
+            stat = os.stat(norm[key])
+            norm[key] = [os.path.abspath(norm[key]), stat.st_size,
+                         stat.st_mtime_ns]
+    return norm
+
+def point_hash(params: dict) -> str:
+    """Return the hash that names the directory of the point.
+
+    """
+    key = json.dumps({'params': normalize(params), 'version': VERSION},
+                     sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:20]
+
+def command() -> list[str]:
+    """Return the command that runs the program.
+
+    """
+    if getattr(sys, 'frozen', False):
+        # The program is a single executable.
+        return [sys.executable]
+    return [sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '__main__.py')]
+
+def run_point(params: dict, dirname: str, loglevel='info') -> str:
+    """Run the point in its directory and return an error message, empty
+    if it was run.
+
+    """
+    os.makedirs(dirname, exist_ok=True)
+    config = configparser.ConfigParser()
+    # The files are found from the directory of the point.
+    config['default'] = dict(params, sink='file',
+                             **{key: os.path.abspath(params[key])
+                                for key in FILES if key in params})
+    with open(os.path.join(dirname, 'rrwg.conf'), 'w') as conff:
+        config.write(conff)
+    proc = subprocess.run(command() + ['--log', loglevel], cwd=dirname,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          text=True, check=False)
+    if proc.returncode != 0:
+        return proc.stderr.strip().splitlines()[-1] if proc.stderr \
+            else 'exit status {}'.format(proc.returncode)
+    tmp = os.path.join(dirname, PARAMS_FNAME + '.tmp')
+    with open(tmp, 'w') as parf:
+        json.dump({'params': normalize(params), 'version': VERSION}, parf)
+    os.replace(tmp, os.path.join(dirname, PARAMS_FNAME))
+    return ''
+
+def run(config: configparser.ConfigParser, nworkers=0, dirname=DIRNAME,
+        loglevel='info') -> int:
+    """Run the points of the sweep that were not finished and return the
+    number of points that failed.
+
+    config (ConfigParser): configuration with the [sweep] section
+    nworkers (int): number of points run at once, the number of CPUs
+                    if 0
+    dirname (str): directory with the directories of the points
+    loglevel (str): log level of the points
+
+    """
+    points = grid(config)
+    for params in points:
+        if 'seed' not in params:
+            raise ValueError('every point of the sweep needs a seed')
+    dirs = [os.path.join(dirname, point_hash(params)) for params in points]
+    todo = [i for i, pdir in enumerate(dirs)
+            if not os.path.exists(os.path.join(pdir, PARAMS_FNAME))]
+    print('* Sweep of {} points, {} cached'.format(len(points),
+                                                   len(points)-len(todo)))
+    with ThreadPoolExecutor(max_workers=nworkers or os.cpu_count()) as pool:
+        errors = dict(zip(todo, pool.map(
+            lambda i: run_point(points[i], dirs[i], loglevel), todo)))
+    for i, err in errors.items():
+        print('* {} {}'.format(dirs[i], 'failed: ' + err if err else 'done'))
+    with open(INDEX_FNAME, 'w') as indexf:
+        json.dump([{'dir': pdir, 'params': normalize(params),
+                    'done': os.path.exists(os.path.join(pdir,
+                                                        PARAMS_FNAME))}
+                   for pdir, params in zip(dirs, points)], indexf, indent=1)
+    print('* Wrote {}'.format(INDEX_FNAME))
+    return sum(1 for err in errors.values() if err)
@@ -0,0 +1,115 @@
+"""Index of the walks that are allowed to visit each vertex.
+
+The territories of the walks do not change after the setup, so the
+index is built once and shared by the simulation and the probability
+calculation. Besides the walks of each vertex, the index has read-only
+views of the territories of the walks in the CSR form of the walks, so
+the steps only touch the vertices where the walks may go, and the walks
+that compete in a vertex are found through the walks of the vertex.
+
+"""
+import numpy as np
+
+from walk import VERTEX_DTYPE, Walks
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    """Return a read-only view of the array.
+
+    """
+    view = arr.view()
+    view.setflags(write=False)
+    return view
+
+class Territory:
+    """Immutable inverted index from a vertex to the ids of the walks
+    that may visit it, saved in compressed sparse row form.
+
+    """
+    def __init__(self, walks: Walks):
+        """Build the index from the territories of the walks.
+
+        walks (Walks): walks whose territories are indexed
+
+        """
+        self._cells = _readonly(walks.cells)
+        self._indptr = _readonly(walks.indptr)
+        self._rows = walks.rows()
+        # Cells sorted by vertex and then by walk.
+        order = np.argsort(self._cells, kind='stable')
+        nverts = walks.nvertices()
+        self._nwalks = np.bincount(self._cells, minlength=nverts)
+        self._vindptr = np.zeros(nverts+1, dtype=np.int64)
+        np.cumsum(self._nwalks, out=self._vindptr[1:])
+        self._wids = self._rows[order]
+        self._pos = order
+        self._groups = None
+        for arr in (self._rows, self._nwalks, self._vindptr, self._wids,
+                    self._pos):
+            arr.setflags(write=False)
+
+    def walks(self, vert: int) -> np.ndarray:
+        """Return the ids of the walks that may visit the vertex vert.
+
+        """
+        return self._wids[self._vindptr[vert]:self._vindptr[vert+1]]
+
+    def positions(self, vert: int) -> np.ndarray:
+        """Return the cell of each walk returned by walks(vert) in the
+        vertex vert.
+
+        """
+        return self._pos[self._vindptr[vert]:self._vindptr[vert+1]]
+
+    def cells(self) -> np.ndarray:
+        """Return the vertex of each cell, the cells of the walk w are
+        indptr()[w] to indptr()[w+1]-1.
+
+        """
+        return self._cells
+
+    def indptr(self) -> np.ndarray:
+        """Return the first cell of each walk and the number of cells.
+
+        """
+        return self._indptr
+
+    def rows(self) -> np.ndarray:
+        """Return the walk of each cell.
+
+        """
+        return self._rows
+
+    def groups(self, first=0, last=None) -> list[tuple]:
+        """Return the walks first to last-1 grouped by the size of their
+        territories, as pairs of the walks of a group and the walks x
+        size array of their cells, both counted from the first walk.
+
+        """
+        nwalks = len(self._indptr) - 1
+        last = nwalks if last is None else last
+        if (first, last) == (0, nwalks) and self._groups is not None:
+            return self._groups
+        indptr = self._indptr[first:last+1]
+        sizes = np.diff(indptr)
+        order = np.argsort(sizes, kind='stable').astype(VERTEX_DTYPE)
+        bounds = np.flatnonzero(np.diff(sizes[order])) + 1
+        groups = []
+        for wids in np.split(order, bounds) if len(order) else []:
+            starts = indptr[wids] - indptr[0]
+            groups.append((wids, starts[:, None] +
+                           np.arange(sizes[wids[0]])))
+        if (first, last) == (0, nwalks):
+            self._groups = groups
+        return groups
+
+    def nwalks(self) -> np.ndarray:
+        """Return the number of walks that may visit each vertex.
+
+        """
+        return self._nwalks
+
+    def order(self) -> int:
+        """Return the number of vertices indexed.
+
+        """
+        return len(self._nwalks)
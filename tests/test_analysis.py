@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import analysis
+from simulation import Simulation
+from sink import file_sink
+
+class TestCurves(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'the curves read in chunks differ from the whole output'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fnames = {fmt: os.path.join(tmpdir, name) for fmt, name in
+                      (('text', 'rrwg.dat'), ('binary', 'rrwg.npy'))}
+            sim = Simulation('partitions', vertices=7, partition_size=3,
+                             nsteps=60, seed=5)
+            for fmt, fname in fnames.items():
+                sim.run(file_sink(fname, fmt))
+            sim.run()
+            occ = sim.output.occupation()
+            cum = np.cumsum(occ, axis=0) / np.arange(1, 62)[:, None]
+            for fname in fnames.values():
+                # Not a multiple of the rows kept, so the last bin is
+                # smaller.
+                result = analysis.analyze(fname, 'cumulative', 20,
+                                          'decimate', 5)
+                self.assertEqual(result['every'], 4, errmsg)
+                self.assertTrue(np.array_equal(result['steps'],
+                                               np.arange(0, 61, 4)), errmsg)
+                self.assertTrue(np.allclose(result['values'], cum[::4],
+                                            atol=5e-4), errmsg)
+                result = analysis.analyze(fname, 'walk', 20, 'envelope', 5)
+                bins = np.arange(0, 61, 4)
+                self.assertTrue(np.allclose(
+                    result['min'], np.minimum.reduceat(occ, bins),
+                    atol=5e-4), errmsg)
+                self.assertTrue(np.allclose(
+                    result['max'], np.maximum.reduceat(occ, bins),
+                    atol=5e-4), errmsg)
+                result = analysis.analyze(fname, 'vertex', 0, size=7)
+                self.assertEqual(list(result['labels']),
+                                 ['v{}'.format(v) for v in range(7)],
+                                 errmsg)
+                self.assertTrue(np.allclose(result['values'].sum(axis=1), 1,
+                                            atol=2e-3), errmsg)
+            counts = sim.output.array()
+            vertex = np.zeros((61, 7))
+            np.add.at(vertex.T, sim.output.vertex_ids, counts.T)
+            result = analysis.analyze(fnames['binary'], 'vertex', 0, size=7)
+            self.assertTrue(np.allclose(
+                result['values'], vertex / vertex.sum(axis=1)[:, None]),
+                errmsg)
+
+class TestTextVertex(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'vertex curve of territories of different sizes accepted'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'rrwg.dat')
+            gname = os.path.join(tmpdir, 'graph.txt')
+            lname = os.path.join(tmpdir, 'labels.txt')
+            with open(gname, 'w') as graphf:
+                graphf.write('0 1\n1 2\n2 3\n3 0\n0 2\n')
+            # The walk 0 may visit three vertices and the walk 1 two.
+            with open(lname, 'w') as labelf:
+                labelf.write('0\n0\n0 1\n1\n')
+            sim = Simulation('file', nsteps=10, graph=gname, labels=lname,
+                             seed=1)
+            sim.run(file_sink(fname, 'text'))
+            with self.assertRaises(ValueError, msg=errmsg):
+                analysis.analyze(fname, 'vertex')
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from checkpoint import Checkpoint
+from rng import Streams
+from simulation import Simulation
+
+def naive_async(nsteps, sim, seed):
+    """Run the async dynamics sampling each move from the cumulative sum
+    of the weights of the territory of the walk.
+
+    """
+    walks = sim.walks.copy()
+    nwalks_vert = sim.territory.nwalks()
+    nwalks = len(walks)
+    streams = Streams(seed)
+    for i in range(1, nsteps+1):
+        movers = np.minimum((streams.uniforms(i, nwalks, purpose=1) *
+                             nwalks).astype(np.int64), nwalks-1)
+        rands = streams.uniforms(i, nwalks, purpose=2)
+        for wid, rand in zip(movers, rands):
+            verts = walks[wid].vertices()
+            cum = np.cumsum(sim.prob.cell_weights(
+                walks.counts[walks.row(wid)], walks.vertex_totals[verts],
+                nwalks_vert[verts]))
+            walks.visit(wid, verts[np.searchsorted(cum, rand*cum[-1],
+                                                   side='right')])
+    return walks
+
+class TestAsync(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'async dynamics differs from the naive sampling'
+        for sim in (Simulation('complete', vertices=5, nsteps=60, seed=3,
+                               dynamics='async'),
+                    Simulation('partitions', vertices=9, partition_size=3,
+                               nsteps=60, seed=3, dynamics='async',
+                               check=True)):
+            expected = naive_async(60, sim, 3)
+            walks = sim.run()
+            self.assertTrue(np.array_equal(walks.counts, expected.counts),
+                            errmsg)
+            self.assertTrue(np.array_equal(walks.vertex_totals,
+                                           expected.vertex_totals), errmsg)
+            # The trees rebuilt after each checkpoint give the same walks.
+            with tempfile.TemporaryDirectory() as tmpdir:
+                walks = sim.run(ckpt=Checkpoint(
+                    os.path.join(tmpdir, 'ckpt.npz'), every=7))
+            self.assertTrue(np.array_equal(walks.counts, expected.counts),
+                            errmsg)
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from batch import simulate_batch
+from data import Data
+from graph import Graph
+from prob import Probability
+from rng import sample
+from simul import simulate
+from sink import MemorySink
+from walk import Walks, row_sums
+
+class TestSample(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong vertex sampled'
+        weights = np.array([[1.0, 0.0, 3.0, 0.0],
+                            [0.0, 2.0, 2.0, 0.0]])
+        uniforms = np.array([[0.0, 0.5],
+                             [0.25, 0.999999999999999999],
+                             [0.2, 0.49]])
+        chosen = [sample(weights, u) for u in uniforms]
+        self.assertEqual(chosen[0].tolist(), [0, 2], errmsg)
+        self.assertEqual(chosen[1].tolist(), [2, 2], errmsg)
+        self.assertEqual(chosen[2].tolist(), [0, 1], errmsg)
+
+class TestBatch(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong number of visits in the replicas'
+        nverts, nsteps, nreps = 5, 40, 7
+        graph = Graph(nverts, complete=False, partition_size=2)
+        graph.connect_partitions()
+        walks = Walks(nverts, nverts)
+        for i in graph.vertices():
+            walks.add(graph.partition(i), i)
+        counts = simulate_batch(nreps, nsteps, graph, walks,
+                                Probability('POW'), seed=3)
+        self.assertEqual(counts.shape, (nreps,) + walks.cells.shape, errmsg)
+        self.assertTrue((row_sums(counts, walks.indptr) == 2 + nsteps).all(),
+                        errmsg)
+        self.assertTrue((walks.totals == 2).all(), errmsg)
+
+class TestBatchSerial(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'batch replica differs from the serial simulation'
+        nverts, nsteps, nreps = 4, 60, 3
+        graph = Graph(nverts)
+        walks = Walks(nverts, nverts)
+        for i in graph.vertices():
+            walks.add(graph.vertices(), i)
+        prob = Probability('EXP')
+        prob.alpha = 3.0
+        counts = simulate_batch(nreps, nsteps, graph, walks, prob, seed=5)
+        for rep in range(nreps):
+            serial = walks.copy()
+            simulate(nsteps, graph, serial, prob, 5,
+                     data=Data(serial, sink=MemorySink()), replica=rep)
+            self.assertTrue((counts[rep] == serial.counts).all(), errmsg)
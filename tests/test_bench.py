@@ -0,0 +1,80 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import bench
+from bench import compare
+from data import Data
+from prob import Probability
+from simul import simulate
+from territory import Territory
+
+def result(steps_per_sec, simulate):
+    return {'cases': [{'name': 'complete-v10', 'steps_per_sec': steps_per_sec,
+                       'peak_rss_kb': 1000,
+                       'phases': {'simulate': simulate}}]}
+
+class TestCompare(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong regressions reported'
+        baseline = result(100.0, 2.0)
+        self.assertEqual(compare(baseline, result(95.0, 2.1)), [], errmsg)
+        regressions = compare(baseline, result(50.0, 4.0))
+        self.assertEqual([metric for _, metric, _, _ in regressions],
+                         ['steps_per_sec', 'phases.simulate'], errmsg)
+        # Faster results are not regressions.
+        self.assertEqual(compare(baseline, result(200.0, 1.0)), [], errmsg)
+
+# A case small enough to run in the tests.
+CASE = {'type': 'partitions', 'vertices': 12, 'walks': 12,
+        'partition_size': 3, 'function': 'POW', 'time': 5}
+
+class TestRun(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong keys in the results of the benchmarks'
+        phases = {'graph', 'walks', 'calculate', 'transitions', 'simulate',
+                  'write_text', 'write_binary'}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for engine in bench.ENGINES:
+                fname = os.path.join(tmpdir, engine + '.json')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    bench.run([CASE], fname, engine)
+                with open(fname) as inf:
+                    report = json.load(inf)
+                self.assertEqual(set(report), {'python', 'numpy', 'platform',
+                                               'engine', 'cases'}, errmsg)
+                self.assertEqual(report['engine'], engine, errmsg)
+                self.assertEqual(len(report['cases']), 1, errmsg)
+                result = report['cases'][0]
+                self.assertEqual(set(result), {'name', 'params', 'engine',
+                                               'steps_per_sec',
+                                               'peak_rss_kb', 'phases'},
+                                 errmsg)
+                self.assertEqual(result['name'], bench.case_name(CASE),
+                                 errmsg)
+                self.assertEqual(set(result['phases']), phases, errmsg)
+                self.assertGreater(result['steps_per_sec'], 0, errmsg)
+
+class TestReference(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'the reference engine walks differently from simulate'
+        counts = []
+        for engine in bench.ENGINES:
+            graph = bench.make_graph(CASE)
+            walks = bench.make_walks(CASE, graph)
+            territory = Territory(walks)
+            prob = Probability(CASE['function'])
+            data = Data(walks, sink=bench.NullSink())
+            if engine == 'reference':
+                bench.simulate_reference(CASE['time'], graph, walks, prob,
+                                         territory, data)
+            else:
+                simulate(CASE['time'], graph, walks, prob, bench.SEED,
+                         territory=territory, data=data)
+            counts.append(walks.counts.copy())
+        self.assertTrue(np.array_equal(*counts), errmsg)
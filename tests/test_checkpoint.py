@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import checkpoint
+from converge import Convergence
+from data import Data
+from graph import Graph
+from prob import Probability
+from simul import simulate
+from simulation import Simulation
+from sink import FileSink, MemorySink, header_fname
+from walk import Walks
+
+def partition_walks(graph: Graph) -> Walks:
+    walks = Walks(graph.order(), graph.order())
+    for i in graph.vertices():
+        walks.add(graph.partition(i), i)
+    return walks
+
+class TestResume(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'resumed run differs from the uninterrupted run'
+        graph = Graph(6, complete=False, partition_size=3)
+        graph.connect_partitions()
+        prob = Probability('POW')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, checkpoint.FNAME)
+            # The run without seed is stopped after the checkpoint of
+            # the step 20.
+            walks = partition_walks(graph)
+            data = Data(walks, sink=MemorySink())
+            simulate(25, graph, walks, prob, territory=None, data=data,
+                     checkpoint=checkpoint.Checkpoint(fname, every=10))
+            resumed = partition_walks(graph)
+            start, entropy = checkpoint.load(fname, resumed)
+        self.assertEqual(start, 20, errmsg)
+        sink = MemorySink()
+        simulate(40, graph, resumed, prob, entropy,
+                 data=Data(resumed, sink=sink, start=start), start=start)
+        self.assertEqual(sink.steps, list(range(21, 41)), errmsg)
+        walks = partition_walks(graph)
+        simulate(40, graph, walks, prob, entropy,
+                 data=Data(walks, sink=MemorySink()))
+        self.assertTrue(np.array_equal(walks.counts, resumed.counts), errmsg)
+
+class TestResumeStop(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'resumed run with a stopping rule differs from the ' \
+            'uninterrupted run'
+        for dynamics, nworkers in (('sync', 1), ('sync', 2), ('async', 1)):
+            sim = Simulation('partitions', vertices=6, partition_size=3,
+                             nsteps=1000, alpha=2.0, seed=7,
+                             dynamics=dynamics)
+            def stop():
+                return Convergence('occupation', every=10, tol=0.5)
+            sim.run(stop=stop(), nworkers=nworkers)
+            expected = sim.output
+            self.assertEqual(expected.header['stop_step'], 100, errmsg)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                fname = os.path.join(tmpdir, checkpoint.FNAME)
+                # The run is stopped after the checkpoint of the step 50.
+                sim.nsteps = 60
+                sim.run(stop=stop(), ckpt=checkpoint.Checkpoint(fname,
+                                                                every=50),
+                        nworkers=nworkers)
+                sim.nsteps = 1000
+                sink = MemorySink()
+                sim.resume(fname, sink, stop=stop(), nworkers=nworkers)
+            self.assertEqual(sink.steps, expected.steps[51:], errmsg)
+            self.assertTrue(np.array_equal(sink.array(),
+                                           expected.array()[51:]), errmsg)
+            self.assertEqual(sink.header['stop_step'], 100, errmsg)
+
+class TestFileResume(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'resumed output file differs from the uninterrupted run'
+        sim = Simulation('partitions', vertices=6, partition_size=3,
+                         nsteps=40, seed=4)
+        for fmt, name in (('text', 'rrwg.dat'), ('binary', 'rrwg.npy')):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                expected = os.path.join(tmpdir, 'expected-' + name)
+                sim.nsteps = 40
+                sim.run(FileSink(expected, fmt), stride=3)
+                fname = os.path.join(tmpdir, name)
+                ckpt = os.path.join(tmpdir, checkpoint.FNAME)
+                # The run is stopped after the checkpoint of the step 20,
+                # the rows of the steps 21 and 24 are dropped on resume.
+                sim.nsteps = 25
+                sim.run(FileSink(fname, fmt), stride=3,
+                        ckpt=checkpoint.Checkpoint(ckpt, every=10))
+                sim.nsteps = 40
+                sim.resume(ckpt, FileSink(fname, fmt), stride=3)
+                fnames = [(expected, fname)]
+                if fmt == 'binary':
+                    fnames.append((header_fname(expected),
+                                   header_fname(fname)))
+                for exp, out in fnames:
+                    with open(exp, 'rb') as expf, open(out, 'rb') as outf:
+                        self.assertEqual(outf.read(), expf.read(), errmsg)
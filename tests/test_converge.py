@@ -0,0 +1,28 @@
+import unittest
+
+from converge import Convergence
+from data import Data
+from graph import Graph
+from prob import Probability
+from simul import simulate
+from sink import MemorySink
+from walk import Walks
+
+class TestConvergence(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'simulation did not stop when the occupation was stable'
+        nverts = 4
+        graph = Graph(nverts)
+        walks = Walks(nverts, nverts)
+        for i in graph.vertices():
+            walks.add(graph.neighbors(0), i)
+        sink = MemorySink()
+        stop = Convergence('occupation', every=50, window=5, tol=0.01)
+        simulate(100000, graph, walks, Probability('EXP'), seed=5,
+                 data=Data(walks, sink=sink), stop=stop)
+        step = sink.header['stop_step']
+        self.assertLess(step, 100000, errmsg)
+        self.assertEqual(step % 50, 0, errmsg)
+        self.assertEqual(sink.steps[-1], step, errmsg)
+        self.assertEqual(int(walks.totals[0]), nverts + step, errmsg)
+        self.assertEqual(sink.header['stop_reason'], stop.reason, errmsg)
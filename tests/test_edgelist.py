@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import edgelist
+from graph import Graph
+
+EDGES = '# a cycle with a chord\n0 1\n1 2 0.5\n2 3\n\n3 0\n2 0\n1 0\n'
+
+class TestLoad(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong graph read from the edge list'
+        expected = Graph(4, complete=False)
+        for i, j in [(0, 1), (1, 2), (2, 3), (3, 0), (2, 0)]:
+            expected.add_edge(i, j)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'graph.txt')
+            with open(fname, 'w') as edgef:
+                edgef.write(EDGES)
+            # The second load maps the cache.
+            for _ in range(2):
+                graph = edgelist.load(fname, chunk=2)
+                for vert in expected.vertices():
+                    self.assertEqual(graph.neighbors(vert).tolist(),
+                                     expected.neighbors(vert).tolist(),
+                                     errmsg)
+            self.assertTrue(os.path.exists(edgelist.cache_fname(fname)),
+                            errmsg)
+            with open(fname, 'a') as edgef:
+                edgef.write('4 5\n')
+            with self.assertRaises(ValueError, msg=errmsg):
+                edgelist.load(fname)
+            lname = os.path.join(tmpdir, 'labels.txt')
+            with open(lname, 'w') as labf:
+                labf.write('10\n2,10\n2\n2\n')
+            terrs = edgelist.read_labels(lname, 4)
+        self.assertEqual([t.tolist() for t in terrs], [[1, 2, 3], [0, 1]],
+                         errmsg)
+
+class TestReached(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong vertices reached by the search'
+        indptr, indices = edgelist.csr(np.array([[0, 1], [1, 2], [3, 4]]),
+                                       5)
+        self.assertEqual(edgelist.reached(indptr, indices).tolist(),
+                         [True, True, True, False, False], errmsg)
+        self.assertEqual(edgelist.reached(indptr, indices, 4).tolist(),
+                         [False, False, False, True, True], errmsg)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import ensemble
+from data import Data
+from simul import simulate
+from simulation import Simulation
+from sink import MemorySink
+
+class TestEnsemble(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'replicas differ from the serial runs'
+        sim = Simulation('partitions', vertices=8, partition_size=3,
+                         nsteps=40, seed=6)
+        expected = []
+        for replica in range(3):
+            walks = sim.walks.copy()
+            sink = MemorySink()
+            simulate(40, sim.graph, walks, sim.prob, 6,
+                     territory=sim.territory, data=Data(walks, sink=sink),
+                     replica=replica)
+            expected.append(sink.array())
+        self.assertFalse(np.array_equal(expected[0], expected[1]), errmsg)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                for nworkers in (1, 2):
+                    fnames = ensemble.run(3, nworkers, 40, sim.graph,
+                                          sim.walks, sim.prob,
+                                          sim.territory, 6, 'binary',
+                                          loglevel='off')
+                    self.assertEqual(fnames, ['rrwg-r0000.npy',
+                                              'rrwg-r0001.npy',
+                                              'rrwg-r0002.npy'], errmsg)
+                    for fname, counts in zip(fnames, expected):
+                        self.assertTrue(np.array_equal(np.load(fname),
+                                                       counts), errmsg)
+            finally:
+                os.chdir(cwd)
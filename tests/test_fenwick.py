@@ -0,0 +1,30 @@
+import unittest
+
+import numpy as np
+
+from fenwick import FenwickForest
+
+class TestFenwickForest(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'Fenwick tree differs from the cumulative sum'
+        rng = np.random.default_rng(0)
+        # Rows of different sizes, one of a single cell.
+        indptr = np.array([0, 13, 14, 19, 35])
+        weights = rng.random(indptr[-1])
+        weights[[4, 16]] = 0.0
+        forest = FenwickForest(weights, indptr)
+        forest.update(np.array([7, 13, 27]), np.array([3.0, 0.5, 0.0]))
+        weights[[7, 13, 27]] = 3.0, 0.5, 0.0
+        for row in range(len(indptr)-1):
+            start, stop = indptr[row], indptr[row+1]
+            cum = np.cumsum(weights[start:stop])
+            self.assertAlmostEqual(forest.total(row), cum[-1], msg=errmsg)
+            for uniform in rng.random(50):
+                self.assertEqual(forest.sample(row, uniform),
+                                 start + np.searchsorted(cum,
+                                                         uniform*cum[-1],
+                                                         side='right'),
+                                 errmsg)
+        forest.rebuild()
+        self.assertAlmostEqual(forest.total(3), weights[19:].sum(),
+                               msg=errmsg)
@@ -1,9 +1,11 @@
 import unittest
 
+import numpy as np
+
 from graph import Graph
 
 N = 3
-graph = Graph(N, npartitions=2)
+graph = Graph(N, partition_size=2)
 
 for i in range(N):
     for j in range(i, N):
@@ -29,3 +31,36 @@ class TestPartition(unittest.TestCase):
         verts = graph.partition(2)
         self.assertEqual(verts[0], 0, errmsg)
         self.assertEqual(verts[1], 2, errmsg)
+
+class TestConnectPartitions(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong neighbors in the graph of partitions'
+        for n, size in [(3, 2), (7, 3), (10, 4), (5, 5)]:
+            explicit = Graph(n, complete=False, partition_size=size)
+            for i in range(n):
+                for j in explicit.partition(i):
+                    explicit.add_edge(i, j)
+            implicit = Graph(n, complete=False, partition_size=size)
+            implicit.connect_partitions()
+            for i in range(n):
+                self.assertEqual(list(implicit.neighbors(i)),
+                                 list(explicit.neighbors(i)), errmsg)
+            self.assertTrue((implicit.neighbors_mask(range(n)) ==
+                             explicit.neighbors_mask(range(n))).all(),
+                            errmsg)
+
+class TestAdjacent(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'adjacency differs from the neighbors'
+        n = 7
+        explicit = Graph(n, complete=False, partition_size=3)
+        for i in range(n):
+            for j in explicit.partition(i):
+                explicit.add_edge(i, j)
+        implicit = Graph(n, complete=False, partition_size=3)
+        implicit.connect_partitions()
+        verts = np.arange(n)
+        for gph in (Graph(n), Graph(n, self_loops=False), explicit,
+                    implicit):
+            self.assertTrue((gph.adjacent(verts[:, None], verts[None]) ==
+                             gph.neighbors_mask(verts)).all(), errmsg)
@@ -0,0 +1,80 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jobs
+from simulation import Simulation
+
+LINES = '''{"id": "a", "type": "partitions", "vertices": 8, \
+"partition_size": 3, "time": 30, "seed": 2}
+# comment
+{"type": "complete", "vertices": 4, "time": 20, "seed": 1, "output": "binary"}
+{"type": "complete", "time": 20}
+not a job
+'''
+
+class TestParse(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong parameters of the job'
+        params = {'type': 'complete', 'vertices': '4', 'check': 'True'}
+        self.assertEqual(jobs.parse('{"type": "complete", "vertices": 4, '
+                                    '"check": true, "seed": null}'),
+                         params, errmsg)
+        self.assertEqual(jobs.parse('type=complete\nvertices=4\ncheck=True'),
+                         params, errmsg)
+        self.assertEqual(jobs.parse('[default]\ntype=complete\nvertices=4\n'
+                                    'check=True'), params, errmsg)
+        with self.assertRaises(ValueError, msg=errmsg):
+            jobs.parse('[1, 2]')
+
+class TestRun(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'the jobs differ from the simulations'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = io.StringIO()
+            nfailed = jobs.run(jobs.read_stream(io.StringIO(LINES)), 2,
+                               tmpdir, 'off', out)
+            statuses = {status['id']: status for status in
+                        map(json.loads, out.getvalue().splitlines())}
+            self.assertEqual(nfailed, 2, errmsg)
+            self.assertEqual({key: status['status'] for key, status
+                              in statuses.items()},
+                             {'a': 'done', 'job-000003': 'done',
+                              'job-000004': 'failed',
+                              'job-000005': 'failed'}, errmsg)
+            with open(os.path.join(tmpdir, 'a', jobs.STATUS_FNAME)) as statf:
+                self.assertEqual(json.load(statf), statuses['a'], errmsg)
+            sim = Simulation('partitions', vertices=8, partition_size=3,
+                             nsteps=30, seed=2)
+            sim.run()
+            rows = np.loadtxt(statuses['a']['files'][0], skiprows=1)
+            self.assertTrue(np.allclose(rows, sim.output.occupation(),
+                                        atol=5e-4), errmsg)
+            sim = Simulation('complete', vertices=4, nsteps=20, seed=1)
+            sim.run()
+            rows = np.load(statuses['job-000003']['files'][0])
+            self.assertTrue(np.array_equal(rows, sim.output.array()),
+                            errmsg)
+
+class TestQueue(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'the files of the queue were not moved'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            queue = os.path.join(tmpdir, 'queue')
+            os.makedirs(queue)
+            with open(os.path.join(queue, 'one.conf'), 'w') as jobf:
+                jobf.write('type=complete\nvertices=3\ntime=10\nseed=1\n')
+            with open(os.path.join(queue, 'two.json'), 'w') as jobf:
+                jobf.write('{"type": "ring"}')
+            nfailed = jobs.run(jobs.read_queue(queue), 1,
+                               os.path.join(tmpdir, 'out'), 'off',
+                               io.StringIO())
+            self.assertEqual(nfailed, 1, errmsg)
+            for sub, names in ((jobs.RUNNING, []), (jobs.DONE, ['one.conf']),
+                               (jobs.FAILED, ['two.json'])):
+                self.assertEqual(os.listdir(os.path.join(queue, sub)),
+                                 names, errmsg)
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+import log
+
+class Unformattable():
+    def __format__(self, spec):
+        raise AssertionError('a message below the level was formatted')
+
+class TestLog(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong messages in the log'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'rrwg.log')
+            try:
+                log.configure('off', fname)
+                log.info('t={}', Unformattable())
+                log.close()
+                self.assertFalse(os.path.exists(fname), errmsg)
+
+                log.configure('info', fname)
+                log.debug('t={}', Unformattable())
+                log.trace('p={}', Unformattable())
+                log.close()
+                self.assertFalse(os.path.exists(fname), errmsg)
+                log.info('alpha={}', 1.5)
+                log.close()
+                # Reopened in append mode after the first write.
+                log.info('seed={}', 2)
+                log.close()
+                with open(fname) as logf:
+                    self.assertEqual(logf.read(), 'alpha=1.5\nseed=2\n',
+                                     errmsg)
+
+                # A new configuration truncates the file.
+                log.configure('debug', fname)
+                log.debug('t={}', 1)
+                log.close()
+                with open(fname) as logf:
+                    self.assertEqual(logf.read(), 't=1\n', errmsg)
+                # The log of a resumed run is appended.
+                log.configure('info', fname, append=True)
+                log.info('resume={}', 20)
+                log.close()
+                with open(fname) as logf:
+                    self.assertEqual(logf.read(), 't=1\nresume=20\n',
+                                     errmsg)
+                with self.assertRaises(ValueError, msg=errmsg):
+                    log.configure('verbose', fname)
+            finally:
+                log.configure('off')
@@ -0,0 +1,37 @@
+import io
+import unittest
+
+from data import Data
+from graph import Graph
+from metrics import Profile
+from prob import Probability
+from simul import simulate
+from sink import MemorySink
+from walk import Walks
+
+class TestProfile(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong profile of the phases'
+        nverts, nsteps = 4, 30
+        graph = Graph(nverts)
+        walks = Walks(nverts, nverts)
+        for i in graph.vertices():
+            walks.add(graph.neighbors(0), i)
+        stream = io.StringIO()
+        profile = Profile(nsteps, progress=1e-9, stream=stream)
+        simulate(nsteps, graph, walks, Probability('EXP'), seed=1,
+                 data=Data(walks, sink=MemorySink()), profile=profile)
+        report = profile.report()
+        self.assertEqual(report['steps'], nsteps, errmsg)
+        self.assertEqual(sorted(report['phases']),
+                         ['close', 'sample', 'transitions', 'visit',
+                          'write'], errmsg)
+        for name in ('sample', 'transitions', 'visit', 'write'):
+            self.assertEqual(report['phases'][name]['calls'], nsteps,
+                             errmsg)
+        self.assertLessEqual(sum(p['seconds'] for p in
+                                 report['phases'].values()),
+                             report['seconds'] + 1e-9, errmsg)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), nsteps, errmsg)
+        self.assertTrue(lines[-1].startswith('step 30/30 '), errmsg)
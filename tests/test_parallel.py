@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from converge import Convergence
+from data import Data
+from parallel import simulate_parallel, split
+from simul import simulate
+from sink import MemorySink
+from simulation import Simulation
+
+class TestSplit(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong ranges of walks of the workers'
+        sim = Simulation('partitions', vertices=10, partition_size=3)
+        self.assertEqual(split(sim.territory, 2).tolist(), [0, 5, 10],
+                         errmsg)
+        self.assertEqual(split(sim.territory, 20).tolist(),
+                         list(range(11)), errmsg)
+
+class TestParallel(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'parallel run differs from the serial run'
+        sim = Simulation('partitions', vertices=12, partition_size=4,
+                         nsteps=200, seed=8)
+        serial = sim.walks.copy()
+        sink = MemorySink()
+        simulate(200, sim.graph, serial, sim.prob, 8, data=Data(
+            serial, sink=sink))
+        for nworkers in (1, 3):
+            walks = sim.walks.copy()
+            psink = MemorySink()
+            simulate_parallel(200, sim.graph, walks, sim.prob, 8,
+                              check=True, data=Data(walks, sink=psink),
+                              nworkers=nworkers)
+            self.assertTrue(np.array_equal(walks.counts, serial.counts),
+                            errmsg)
+            self.assertTrue(np.array_equal(walks.vertex_totals,
+                                           serial.vertex_totals), errmsg)
+            self.assertTrue(np.array_equal(psink.array(), sink.array()),
+                            errmsg)
+
+class TestParallelStop(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'parallel run did not stop at the serial step'
+        sim = Simulation('complete', vertices=4, nsteps=100000, seed=5)
+        steps = []
+        for nworkers in (1, 2):
+            sink = MemorySink()
+            sim.run(sink, stop=Convergence('occupation', every=50,
+                                           window=5, tol=0.01),
+                    nworkers=nworkers)
+            steps.append(sink.header['stop_step'])
+        self.assertEqual(steps[0], steps[1], errmsg)
+        self.assertLess(steps[1], 100000, errmsg)
+
+class TestParallelStopLast(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'parallel run did not stop at the last step'
+        stop = Convergence('occupation', every=50, window=5, tol=0.01)
+        sim = Simulation('complete', vertices=4, nsteps=100000, seed=5)
+        sink = MemorySink()
+        sim.run(sink, stop=stop)
+        # The stopping rule is met at the last step of the run.
+        sim.nsteps = sink.header['stop_step']
+        psink = MemorySink()
+        sim.run(psink, stop=Convergence('occupation', every=50, window=5,
+                                        tol=0.01), nworkers=2)
+        self.assertEqual(psink.header['stop_step'], sim.nsteps, errmsg)
+        self.assertTrue(np.array_equal(psink.array(), sink.array()),
+                        errmsg)
@@ -0,0 +1,126 @@
+import unittest
+
+import numpy as np
+
+from graph import Graph
+from prob import FUNCTIONS, Probability, register
+from simulation import Simulation
+from territory import Territory
+from walk import Walks
+
+N = 5
+PARTSIZE = 3
+
+graph = Graph(N, complete=False, partition_size=PARTSIZE)
+walks = Walks(N, N)
+for i in graph.vertices():
+    part = graph.partition(i)
+    for j in part:
+        graph.add_edge(i, j)
+    walks.add(part, i)
+# Some visits to have different counts in the vertices.
+for i, vert in enumerate([1, 2, 2, 3, 4, 4, 0, 1, 2, 3]):
+    w = i % N
+    if walks.position(w, vert) >= 0:
+        walks.visit(w, vert)
+territory = Territory(walks)
+
+def scalar_transitions(prob, walks=walks, graph=graph,
+                       territory=territory):
+    probs = np.zeros((len(walks), graph.order()))
+    for i, walk in enumerate(walks):
+        for v_dest in graph.neighbors(walk.cur_location()):
+            if walks.position(i, v_dest) >= 0:
+                probs[i, v_dest] = prob.calculate(walks, walk, v_dest,
+                                                  territory)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+def cell_transitions(prob, walks=walks, graph=graph, territory=territory):
+    probs = np.zeros((len(walks), graph.order()))
+    probs[territory.rows(), territory.cells()] = \
+        prob.transitions(walks, graph, territory)
+    return probs
+
+class TestTransitions(unittest.TestCase):
+    def runTest(self):
+        for func in ['EXP', 'POW']:
+            prob = Probability(func)
+            prob.alpha = 2.5
+            prob.epsilon = 0.1
+            np.testing.assert_allclose(cell_transitions(prob),
+                                       scalar_transitions(prob),
+                                       rtol=1e-12,
+                                       err_msg='wrong {} transitions'
+                                       .format(func))
+
+class TestUneven(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong transitions in territories of different sizes'
+        # A ring with a hub, the territory of each walk is the
+        # neighborhood of its vertex.
+        hub = Graph(7, complete=False)
+        for i in range(6):
+            hub.add_edge(i, (i+1) % 6)
+            hub.add_edge(i, 6)
+        hub_walks = Walks(7, 7)
+        for i in hub.vertices():
+            hub_walks.add(hub.neighbors(i), i)
+        for i, vert in enumerate([6, 1, 6, 3, 4, 6, 5]):
+            hub_walks.visit(i, vert)
+        self.assertEqual(len(hub_walks.cells), 6*4 + 7, errmsg)
+        hub_territory = Territory(hub_walks)
+        prob = Probability('POW')
+        prob.alpha = 2.0
+        np.testing.assert_allclose(
+            cell_transitions(prob, hub_walks, hub, hub_territory),
+            scalar_transitions(prob, hub_walks, hub, hub_territory),
+            rtol=1e-12, err_msg=errmsg)
+
+class TestRegister(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong registered function'
+        register('LOGISTIC', params={'alpha': 1.0, 'beta': 0.5},
+                 bounds={'alpha': (0.0, None), 'beta': (0.0, 1.0)})(
+                     lambda nvw, others, nwalks, alpha, beta:
+                     1.0 / (1.0 + np.exp(alpha * (others - beta))))
+        try:
+            prob = Probability('logistic', beta=0.25)
+            self.assertEqual(prob.params(), {'alpha': 1.0, 'beta': 0.25},
+                             errmsg)
+            np.testing.assert_allclose(cell_transitions(prob),
+                                       scalar_transitions(prob),
+                                       rtol=1e-12, err_msg=errmsg)
+            with self.assertRaises(ValueError, msg=errmsg):
+                prob.set_params(beta=2.0)
+            with self.assertRaises(ValueError, msg=errmsg):
+                prob.set_params(gamma=1.0)
+            with self.assertRaises(ValueError, msg=errmsg):
+                prob.alpha = -1.0
+            with self.assertRaises(ValueError, msg=errmsg):
+                Simulation('complete', vertices=4, function='logistic',
+                           alpha=-5.0)
+            # Epsilon is accepted although the function ignores it.
+            prob.epsilon = 0.5
+        finally:
+            del FUNCTIONS['LOGISTIC']
+        with self.assertRaises(ValueError, msg=errmsg):
+            Probability('LOGISTIC')
+
+class TestBounds(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'invalid parameters or weights accepted'
+        with self.assertRaises(ValueError, msg=errmsg):
+            Probability('EXP', alpha=-1.0)
+        with self.assertRaises(ValueError, msg=errmsg):
+            Probability('POW', epsilon=1.5)
+        register('NAN', params={'alpha': 1.0})(
+            lambda nvw, others, nwalks, alpha: np.sqrt(others - alpha))
+        try:
+            # The weights of the walks are NaN, none can move.
+            with self.assertRaises(ValueError, msg=errmsg):
+                Probability('NAN').transitions(walks, graph, territory)
+            with self.assertRaises(ValueError, msg=errmsg):
+                Simulation('complete', vertices=3, nsteps=2,
+                           function='NAN', dynamics='async').run()
+        finally:
+            del FUNCTIONS['NAN']
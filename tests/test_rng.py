@@ -0,0 +1,19 @@
+import unittest
+
+import numpy as np
+
+from rng import Streams
+
+class TestStreams(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'stream differs from numpy Philox'
+        streams = Streams(1234, replica=2)
+        for step in [1, 5, 2**40]:
+            philox = [np.random.Generator(np.random.Philox(
+                key=streams.key, counter=[step-1, w, 2, 0])).random()
+                      for w in range(6)]
+            self.assertEqual(streams.uniforms(step, 6).tolist(), philox,
+                             errmsg)
+        batch = streams.uniforms(3, 4, replicas=[0, 2])
+        self.assertEqual(batch[1].tolist(), streams.uniforms(3, 4).tolist(),
+                         errmsg)
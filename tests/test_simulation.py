@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from batch import simulate_batch
+from simulation import Simulation
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestNoFiles(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'importing and running a simulation wrote files'
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # The module of the program is loaded by its path, the name
+            # __main__ is the module of -c.
+            code = 'import importlib.util, sys, simulation\n' \
+                'spec = importlib.util.spec_from_file_location(' \
+                '"rrwg_main", sys.argv[1])\n' \
+                'spec.loader.exec_module(' \
+                'importlib.util.module_from_spec(spec))\n' \
+                'sim = simulation.Simulation("complete", vertices=4, ' \
+                'nsteps=20, seed=1)\n' \
+                'sim.run()\n' \
+                'print(sim.output.array().shape)'
+            proc = subprocess.run([sys.executable, '-c', code,
+                                   os.path.join(ROOT, '__main__.py')],
+                                  cwd=tmpdir,
+                                  env=dict(os.environ, PYTHONPATH=ROOT),
+                                  capture_output=True, text=True, check=True)
+            self.assertEqual(os.listdir(tmpdir), [], errmsg)
+        self.assertEqual(proc.stdout, '(21, 16)\n', errmsg)
+
+class TestSimulation(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'simulation differs from the batch of a single replica'
+        sim = Simulation('partitions', vertices=8, partition_size=3,
+                         nsteps=30, seed=4)
+        initial = sim.walks.counts.copy()
+        walks = sim.run()
+        self.assertEqual(sim.output.steps, list(range(31)), errmsg)
+        counts = simulate_batch(1, 30, sim.graph, sim.walks, sim.prob, 4)
+        self.assertTrue(np.array_equal(walks.counts, counts[0]), errmsg)
+        self.assertTrue(np.array_equal(sim.run_batch(1), counts), errmsg)
+        # The initial walks are not changed by the runs.
+        self.assertTrue(np.array_equal(sim.walks.counts, initial), errmsg)
+
+class TestInvalid(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'invalid parameters were accepted'
+        with self.assertRaises(ValueError, msg=errmsg):
+            Simulation('ring', vertices=4)
+        with self.assertRaises(ValueError, msg=errmsg):
+            Simulation('complete', vertices=4, function='LOG')
+        with self.assertRaises(ValueError, msg=errmsg):
+            Simulation('partitions', vertices=4, partition_size=5)
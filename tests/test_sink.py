@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from data import Data
+from graph import Graph
+from prob import Probability
+from simul import simulate
+from sink import MemorySink, SummarySink, ThreadedSink
+from walk import Walks
+
+N = 4
+STEPS = 50
+
+def run(sink):
+    graph = Graph(N)
+    walks = Walks(N, N)
+    for i in graph.vertices():
+        walks.add(graph.vertices(), i)
+    data = Data(walks, stride=3, sink=sink)
+    simulate(STEPS, graph, walks, Probability('EXP'), 10, data=data)
+
+class TestThreadedSink(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong rows written by the writer thread'
+        direct = MemorySink()
+        run(direct)
+        threaded = MemorySink()
+        run(ThreadedSink(threaded, maxsize=2))
+        self.assertEqual(direct.steps, list(range(0, STEPS+1, 3)), errmsg)
+        self.assertEqual(threaded.steps, direct.steps, errmsg)
+        self.assertTrue((threaded.array() == direct.array()).all(), errmsg)
+        np.testing.assert_allclose(direct.occupation().sum(axis=1), N,
+                                   err_msg=errmsg)
+        # Each walk starts with one visit in each vertex.
+        self.assertEqual(direct.array()[-1].sum(), N*(N + direct.steps[-1]),
+                         errmsg)
+
+class TestSummarySink(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong summary of the rows'
+        direct = MemorySink()
+        run(direct)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'rrwg.npz')
+            sink = SummarySink(fname)
+            run(sink)
+            self.assertEqual(sink.fname, fname, errmsg)
+            with np.load(fname) as record:
+                summary = {name: record[name] for name in record.files}
+        occ = direct.occupation()
+        np.testing.assert_allclose(summary['mean'], occ.mean(axis=0),
+                                   err_msg=errmsg)
+        np.testing.assert_allclose(summary['var'], occ.var(axis=0),
+                                   atol=1e-12, err_msg=errmsg)
+        np.testing.assert_allclose(summary['occupation'], occ[-1],
+                                   err_msg=errmsg)
+        self.assertEqual(json.loads(str(summary['header']))['last_step'],
+                         direct.steps[-1], errmsg)
+        # First row where each column has more than the initial visit.
+        counts = direct.array()
+        visited = counts > counts[0]
+        hitting = np.where(visited.any(axis=0),
+                           np.array(direct.steps)[visited.argmax(axis=0)],
+                           -1)
+        self.assertEqual(summary['hitting'].tolist(), hitting.tolist(),
+                         errmsg)
+        # The pairs of the dense walks x walks product of the supports.
+        supp = np.zeros((N, N))
+        supp[direct.walk_ids, direct.vertex_ids] = occ[-1] > 0.01
+        joint = (supp @ supp.T).astype(np.int64)
+        first, second = np.nonzero(np.triu(joint))
+        self.assertEqual(summary['joint_support'].tolist(),
+                         np.stack([first, second, joint[first, second]],
+                                  axis=1).tolist(), errmsg)
@@ -0,0 +1,78 @@
+import configparser
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import sweep
+
+CONF = '''
+[default]
+type=partitions
+vertices=5
+time=50
+seed=1
+
+[sweep]
+alpha=1, 2.0
+partition_size=2,3
+'''
+
+class TestGrid(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'wrong points of the sweep'
+        config = configparser.ConfigParser()
+        config.read_string(CONF)
+        points = sweep.grid(config)
+        self.assertEqual([(p['alpha'], p['partition_size']) for p in points],
+                         [('1', '2'), ('1', '3'), ('2.0', '2'),
+                          ('2.0', '3')], errmsg)
+        hashes = {sweep.point_hash(p) for p in points}
+        self.assertEqual(len(hashes), 4, errmsg)
+        # The same point written in other forms has the same hash.
+        same = dict(points[0], alpha='1.0', epsilon='0', log='debug',
+                    check='no')
+        self.assertEqual(sweep.point_hash(same), sweep.point_hash(points[0]),
+                         errmsg)
+        self.assertNotEqual(sweep.point_hash(dict(points[0], seed='2')),
+                            sweep.point_hash(points[0]), errmsg)
+
+class TestResume(unittest.TestCase):
+    def runTest(self):
+        errmsg = 'the sweep did not run only the points not finished'
+        config = configparser.ConfigParser()
+        config.read_string(CONF)
+        del config['sweep']['partition_size']
+        config['default']['partition_size'] = '2'
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.chdir(tmpdir)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.assertEqual(sweep.run(config, 2), 0, errmsg)
+                with open(sweep.INDEX_FNAME) as indexf:
+                    dirs = [point['dir'] for point in json.load(indexf)]
+                outputs = [os.path.join(pdir, 'rrwg.dat') for pdir in dirs]
+                mtimes = [os.stat(fname).st_mtime_ns for fname in outputs]
+                # The second point is left as if the sweep was stopped
+                # while it ran.
+                os.remove(os.path.join(dirs[1], sweep.PARAMS_FNAME))
+                os.remove(outputs[1])
+                with contextlib.redirect_stdout(io.StringIO()) as out:
+                    self.assertEqual(sweep.run(config, 2), 0, errmsg)
+                self.assertIn('2 points, 1 cached', out.getvalue(), errmsg)
+                self.assertIn('{} done'.format(dirs[1]), out.getvalue(),
+                              errmsg)
+                self.assertNotIn('{} done'.format(dirs[0]), out.getvalue(),
+                                 errmsg)
+                self.assertEqual(os.stat(outputs[0]).st_mtime_ns, mtimes[0],
+                                 errmsg)
+                self.assertTrue(os.path.exists(outputs[1]), errmsg)
+                with open(sweep.INDEX_FNAME) as indexf:
+                    self.assertTrue(all(point['done']
+                                        for point in json.load(indexf)),
+                                    errmsg)
+            finally:
+                os.chdir(cwd)
@@ -1,50 +1,89 @@
 """Data representation of walks.
 
+All the visit counts are kept in flat arrays owned by Walks, in
+compressed sparse row (CSR) form: the cells of the walk w, one per
+vertex of its territory in increasing order of vertex, are the cells
+indptr[w] to indptr[w+1]-1, with the vertex of each cell in cells and
+its number of visits in counts. The memory grows with the total size of
+the territories, not with the number of vertices of the graph nor with
+the largest territory. A Walk object is only a view of one row of these
+arrays, so the simulation, the probability calculation and the data
+output read the counts from one contiguous buffer.
+
 """
+import numpy as np
+
+# Type used to store the number of visits, 4 bytes per cell.
+COUNT_DTYPE = np.uint32
+# Type used to store the vertex of each cell.
+VERTEX_DTYPE = np.int32
+# Arrays that hold the whole state of the walks.
+STATE = ('counts', 'cells', 'indptr', 'locations', 'totals',
+         'vertex_totals')
+
+def row_sums(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Return the sum of the values of each row of a CSR array, zero for
+    the empty rows. The rows are on the last axis of the values.
+
+    values (np.ndarray): values of the cells, the leading axes are kept
+    indptr (np.ndarray): the row i has the cells indptr[i] to
+                         indptr[i+1]-1
+
+    """
+    sums = np.zeros(values.shape[:-1] + (len(indptr)-1,))
+    starts = indptr[:-1]
+    # The empty rows add nothing to the row before them.
+    filled = starts < indptr[1:]
+    if filled.any():
+        sums[..., filled] = np.add.reduceat(values, starts[filled],
+                                            axis=-1)
+    return sums
+
 class Walk:
     """Data representation of walk.
 
     """
-    def __init__(self, vertices: list[int], start_location: int):
-        """Create an instance of walk data representation.
+    def __init__(self, walks: 'Walks', index: int):
+        """Create a view of the walk with the specified index in the
+        walks state.
 
-        vertices (list[int]): the vertices index where the walk is
-                              allowed to visit.
-        start_location (int): current location of the walk in terms
-        of vertices
+        walks (Walks): the state where the walk data is saved
+        index (int): index of the walk in the state
         """
-        self._vertices = vertices
-        # Save the number of visits in each vertex.
-        # The default number of visits before the walk starts
-        # is one.
-        self._nvisits = {}
-        # Initialize the number of visits per vertex
-        for i in vertices:
-            if i == start_location:
-                self._nvisits[i] = 1
-            else:
-                self._nvisits[i] = 1
-        # Save the current walk location.
-        self._curloc = start_location
-
-    def vertices(self):
+        self._walks = walks
+        self._id = index
+
+    @property
+    def index(self) -> int:
+        """Return the index of the walk in the walks state.
+
+        """
+        return self._id
+
+    @property
+    def walks(self) -> 'Walks':
+        """Return the walks state that the walk belongs to.
+
+        """
+        return self._walks
+
+    def vertices(self) -> np.ndarray:
         """Return the vertices where the walk is allowed to go.
 
         """
-        return self._vertices
+        return self._walks.cells[self._walks.row(self._id)]
 
     def cur_location(self) -> int:
         """Return the current location in terms of vertex.
 
         """
-        return self._curloc
+        return int(self._walks.locations[self._id])
 
     def visit(self, vert: int):
         """Update the Walk variables when it visits a new location.
 
         """
-        self._curloc = vert
-        self._nvisits[vert] += 1
+        self._walks.visit(self._id, vert)
 
     def nvisits(self, vert: int) -> int:
         """Return the number of visits in the vertex location by the current
@@ -53,26 +92,21 @@ class Walk:
 
         vert (int): vertex location
         """
-        if vert not in self._nvisits:
-            return 0
-        return self._nvisits[vert]
+        return self._walks.nvisits(self._id, vert)
 
     def total_visits(self) -> int:
         """Return the total number of visits by the current
         walk in all vertices that it can go to.
         """
-        acc = 0
-
-        for nvis in self._nvisits.values():
-            acc += nvis
-
-        return acc
+        return int(self._walks.totals[self._id])
 
 class Walks:
-    """Walks is a placeholder for a set of Walk objects.
+    """Walks keeps the state of a set of walks: the number of visits of
+    each walk in each vertex of its territory, the current locations and
+    the total number of visits per walk and per vertex.
 
     """
-    def __init__(self):
+    def __init__(self, nwalks: int, nvertices: int):
         """Data representation of the Walks.
 
         nwalks (int): number of walks to be initialized
@@ -80,12 +114,91 @@ class Walks:
         the walks
 
         """
+        self._n = 0
         self._walks = []
-        self._i = 0
+        # The cells of the walk w are indptr[w] to indptr[w+1]-1.
+        self.indptr = np.zeros(nwalks+1, dtype=np.int64)
+        # Vertex of each cell, the territory of each walk in increasing
+        # order, and number of visits of the walk in it. They are views
+        # of buffers that grow as the walks are added.
+        self._cellbuf = np.zeros(0, dtype=VERTEX_DTYPE)
+        self._countbuf = np.zeros(0, dtype=COUNT_DTYPE)
+        self.cells = self._cellbuf
+        self.counts = self._countbuf
+        # Current location of each walk.
+        self.locations = np.zeros(nwalks, dtype=np.int64)
+        # Total number of visits of each walk.
+        self.totals = np.zeros(nwalks, dtype=np.int64)
+        # Total number of visits in each vertex by all walks.
+        self.vertex_totals = np.zeros(nvertices, dtype=np.int64)
+
+    def add(self, vertices, start_location: int) -> Walk:
+        """Add a new walk to the state and return its view.
+
+        vertices (list[int]): the vertices index where the walk is
+                              allowed to visit.
+        start_location (int): current location of the walk in terms
+        of vertices
+        """
+        if self._n == len(self.locations):
+            raise IndexError('all {} walks were already added'
+                             .format(self._n))
+        i = self._n
+        verts = np.unique(np.asarray(vertices, dtype=VERTEX_DTYPE))
+        begin = int(self.indptr[i])
+        end = begin + len(verts)
+        if end > len(self._cellbuf):
+            # The buffers double, so adding the walks takes time
+            # proportional to the total size of the territories.
+            size = max(end, 2*len(self._cellbuf))
+            self._cellbuf = np.resize(self._cellbuf, size)
+            self._countbuf = np.resize(self._countbuf, size)
+        self._cellbuf[begin:end] = verts
+        # The default number of visits before the walk starts
+        # is one in each vertex.
+        self._countbuf[begin:end] = 1
+        self.indptr[i+1] = end
+        if i+1 == len(self.locations):
+            # The last walk, the buffers keep only the cells.
+            self._cellbuf = self._cellbuf[:end].copy()
+            self._countbuf = self._countbuf[:end].copy()
+        self.cells = self._cellbuf[:end]
+        self.counts = self._countbuf[:end]
+        self.totals[i] = len(verts)
+        self.vertex_totals[verts] += 1
+        self.locations[i] = start_location
+        walk = Walk(self, i)
+        self._walks.append(walk)
+        self._n += 1
+        return walk
+
+    def copy(self) -> 'Walks':
+        """Return an independent copy of the state of the walks.
+
+        """
+        walks = Walks(0, 0)
+        for name in STATE:
+            setattr(walks, name, getattr(self, name).copy())
+        walks._cellbuf, walks._countbuf = walks.cells, walks.counts
+        walks._n = self._n
+        walks._walks = [Walk(walks, i) for i in range(self._n)]
+        return walks
 
     def __len__(self):
         return len(self._walks)
 
+    def __iter__(self):
+        return iter(self._walks)
+
+    def __getitem__(self, walk: int) -> Walk:
+        return self._walks[walk]
+
+    def nvertices(self) -> int:
+        """Return the number of vertices in the graph used by the walks.
+
+        """
+        return len(self.vertex_totals)
+
     def get(self, walk: int) -> Walk:
         """Return the specified walk.
         """
@@ -95,32 +208,87 @@ class Walks:
         """Return the current walk location in terms of vertices.
 
         """
-        return self._walks[walk].cur_location()
+        return int(self.locations[walk])
+
+    def row(self, walk: int) -> slice:
+        """Return the slice of the cells of the walk.
+
+        """
+        return slice(int(self.indptr[walk]), int(self.indptr[walk+1]))
+
+    def rows(self) -> np.ndarray:
+        """Return the walk of each cell.
+
+        """
+        return np.repeat(np.arange(len(self.locations), dtype=VERTEX_DTYPE),
+                         np.diff(self.indptr))
+
+    def position(self, walk: int, vert: int) -> int:
+        """Return the cell of the walk in the vertex vert, -1 if the walk
+        may not visit it.
+
+        """
+        row = self.row(walk)
+        pos = row.start + int(np.searchsorted(self.cells[row], vert))
+        return pos if pos < row.stop and self.cells[pos] == vert else -1
 
     def nvisits(self, walk, vert):
-        """Mark a walk visitation.
+        """Return the number of visits of a walk in a vertex.
 
         walk (int): index of the walk
         vert (int): index of the vertex visited
 
         """
-        return self._walks[walk].nvisits(vert)
+        pos = self.position(walk, vert)
+        return int(self.counts[pos]) if pos >= 0 else 0
 
     def count_vertex_visits(self, vert) -> int:
         """Count the number of visits in the vertex vert.
 
         """
-        nvis = 0
-        for walk in self._walks:
-            nvis += walk.nvisits(vert)
-
-        return nvis
+        return int(self.vertex_totals[vert])
 
-    def visit(self, walk, vert):
+    def visit(self, walk, vert, pos=None):
         """Mark a walk visitation.
 
         walk (int): index of the walk that is performing the visit
         vert (int): index of the vertex being visited
+        pos (int): cell of the walk in the vertex, looked up if not
+                   given
+
+        """
+        if pos is None:
+            pos = self.position(walk, vert)
+            if pos < 0:
+                raise ValueError('w{} may not visit v{}'.format(walk, vert))
+        self.counts[pos] += 1
+        self.totals[walk] += 1
+        self.vertex_totals[vert] += 1
+        self.locations[walk] = vert
+
+    def visit_all(self, positions: np.ndarray):
+        """Mark the visitation of all walks at once, the walk i goes to the
+        vertex of the cell positions[i], which is in its row.
+
+        positions (np.ndarray): cell of the destination of each walk
+
+        """
+        dests = self.cells[positions]
+        self.counts[positions] += 1
+        self.totals += 1
+        np.add.at(self.vertex_totals, dests, 1)
+        self.locations[:] = dests
+
+    def check(self):
+        """Recompute the total number of visits per walk and per vertex
+        from the counts and compare them with the values updated at each
+        visit. AssertionError is raised if they differ.
 
         """
-        self._walks[walk].visit(vert)
+        if not np.array_equal(row_sums(self.counts, self.indptr),
+                              self.totals):
+            raise AssertionError('walk totals differ from the counts')
+        vertex_totals = np.bincount(self.cells, weights=self.counts,
+                                    minlength=len(self.vertex_totals))
+        if not np.array_equal(vertex_totals, self.vertex_totals):
+            raise AssertionError('vertex totals differ from the counts')